@@ -1,43 +1,293 @@
-from flask import Flask, request, redirect, jsonify, json, g
+from flask import Flask, request, g, Response
 import time
 import jiosaavn
+import helper
+import lyrics
+import song_index
+import song_store
+import upstream
+import metrics
+import warmer
 import os
-from traceback import print_exc
+import hmac
 from flask_cors import CORS
-from response_helper import success_response, error_response, pagination_meta
-from cache import clear_cache
+from response_helper import success_response, error_response, pagination_meta, decode_cursor, stream_response, STREAM_MIMETYPES, response_cache_stats, clear_response_cache
+from cache import clear_cache, cache_stats
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET", 'thankyoutonystark#weloveyou3000')
 CORS(app)
 
+# Refill the cache with last run's hottest calls and keep them fresh
+warmer.start()
+
 # ... (keep all your existing setup code) ...
 
+@app.before_request
+def start_request_timing():
+    g.timings = metrics.start_request()
+
+@app.after_request
+def add_server_timing(response):
+    timings = g.get('timings')
+    if timings is not None:
+        total = time.perf_counter() - timings.started
+        rule = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.http_seconds.observe(total, rule, str(response.status_code))
+        if metrics.METRICS_ENABLED:
+            response.headers["Server-Timing"] = timings.header(total)
+    return response
+
+def requested_fields():
+    """(fields, include_lyrics) from the fields= and lyrics= parameters.
+
+    fields is None when every field is wanted; lyrics=true adds lyrics to an
+    explicit field list. Raises ValueError on an unknown field.
+    """
+    include_lyrics = request.args.get('lyrics', 'false').lower() == 'true'
+    fields = helper.normalize_fields(request.args.get('fields'))
+    if fields is not None:
+        if include_lyrics:
+            fields = helper.normalize_fields(fields + ("lyrics",))
+        include_lyrics = "lyrics" in fields
+    return fields, include_lyrics
+
 @app.route('/v2/songs/search')
 def search_songs_clean():
     try:
         query = request.args.get('query', '').strip()
         page = max(1, request.args.get('page', 1, type=int))
-        limit = min(request.args.get('limit', 20, type=int), 50)
-        include_lyrics = request.args.get('lyrics', 'false').lower() == 'true'
+        limit = max(1, min(request.args.get('limit', 20, type=int), 50))
         use_scraping = request.args.get('scraping', 'true').lower() == 'true'
+        use_local = request.args.get('local', 'false').lower() == 'true'
+        try:
+            fields, include_lyrics = requested_fields()
+        except ValueError as e:
+            return error_response(str(e), 400)
+        
+        # A cursor from a previous page's meta overrides the paging parameters
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                state = decode_cursor(cursor)
+                query = str(state.get('q', '')).strip()
+                page = max(1, int(state.get('p', 1)))
+                limit = min(max(1, int(state.get('l', 20))), 50)
+                use_scraping = state.get('s', True)
+                if not isinstance(use_scraping, bool):
+                    raise ValueError("Invalid cursor")
+            except (TypeError, ValueError):
+                return error_response("Invalid cursor", 400)
         
         if not query:
             return error_response("Query parameter is required", 400)
         
-        # Use hybrid search
-        results = jiosaavn.search_for_song_clean(query, page, limit, use_scraping)
+        cursor_state = {"q": query, "l": limit, "s": use_scraping}
+        
+        # Streaming mode: flush each song as soon as its source answers
+        stream_format = request.args.get('stream', '').lower()
+        if stream_format:
+            if stream_format not in STREAM_MIMETYPES:
+                return error_response("stream must be ndjson or sse", 400)
+            events = stream_search_events(query, page, limit, use_scraping, use_local, fields, include_lyrics, cursor_state)
+            return stream_response(events, stream_format)
+        
+        # Use the local index when asked and it can answer, else hybrid search
+        results = jiosaavn.search_local(query, limit) if use_local and page == 1 else None
+        if results is not None:
+            total = len(results)
+            if fields is not None:
+                results = [helper.project_song(song, fields) for song in results]
+        else:
+            search_page = jiosaavn.search_songs_page(query, page, limit, use_scraping, fields)
+            results, total = search_page["results"], search_page["total"]
+        
+        meta = pagination_meta(page, limit, total, cursor_state)
         
-        # Add lyrics if requested
+        # Warm the next page while the client reads this one
+        if meta["has_next"]:
+            jiosaavn.prefetch_search_page(query, page + 1, limit, use_scraping)
+        
+        # Add lyrics if requested, fetched concurrently for the whole page
         if include_lyrics:
-            for song in results:
-                if song.get('lyrics_id'):
-                    song['lyrics'] = jiosaavn.get_lyrics(song['lyrics_id'])
+            results = lyrics.attach_lyrics(results)
         
-        meta = pagination_meta(page, limit, len(results))
-        return success_response(results, "Songs retrieved successfully", meta)
+        return success_response(results, "Songs retrieved successfully", meta, max_age=300)
         
     except Exception as e:
         return error_response("Search failed", 500, str(e))
 
+def stream_search_events(query, page, limit, use_scraping, use_local, fields, include_lyrics, cursor_state):
+    """(event, data) pairs for a streamed search: each song, then the meta"""
+    local_results = jiosaavn.search_local(query, limit) if use_local and page == 1 else None
+    if local_results is not None:
+        songs = [helper.project_song(song, fields) for song in local_results]
+        if include_lyrics:
+            songs = lyrics.attach_lyrics(songs)
+        events = [("song", song) for song in songs] + [("meta", {"total": len(local_results)})]
+    else:
+        events = jiosaavn.iter_search_songs(query, page, limit, use_scraping, fields, include_lyrics)
+    
+    for event, data in events:
+        if event == "song":
+            yield event, data
+        else:
+            meta = pagination_meta(page, limit, data["total"], cursor_state)
+            if meta["has_next"]:
+                jiosaavn.prefetch_search_page(query, page + 1, limit, use_scraping)
+            yield "meta", meta
+
+@app.route('/v2/songs/autocomplete')
+def autocomplete_songs():
+    try:
+        query = request.args.get('query', '').strip()
+        limit = min(request.args.get('limit', 10, type=int), 50)
+        
+        if not query:
+            return error_response("Query parameter is required", 400)
+        
+        results, confidence = song_index.index.search(query, limit)
+        return success_response(results, "Songs retrieved successfully", {"confidence": confidence}, max_age=60)
+        
+    except Exception as e:
+        return error_response("Autocomplete failed", 500, str(e))
+
+@app.route('/v2/songs')
+def get_songs_clean():
+    try:
+        ids = [song_id.strip() for song_id in request.args.get('ids', '').split(',') if song_id.strip()]
+        try:
+            fields, include_lyrics = requested_fields()
+        except ValueError as e:
+            return error_response(str(e), 400)
+        
+        if not ids:
+            return error_response("ids parameter is required", 400)
+        if len(ids) > 200:
+            return error_response("At most 200 ids per request", 400)
+        
+        results = jiosaavn.get_songs_clean(ids, include_lyrics)
+        if fields is not None:
+            results = [helper.project_song(song, fields) for song in results]
+        found = {song['id'] for song in results}
+        meta = {"requested": len(ids), "found": len(results),
+                "missing": [song_id for song_id in ids if song_id not in found]}
+        return success_response(results, "Songs retrieved successfully", meta, max_age=1800)
+        
+    except Exception as e:
+        return error_response("Songs lookup failed", 500, str(e))
+
+@app.route('/v2/songs/<song_id>')
+def get_song_clean(song_id):
+    try:
+        try:
+            fields, include_lyrics = requested_fields()
+        except ValueError as e:
+            return error_response(str(e), 400)
+        
+        song = jiosaavn.get_song_clean(song_id, include_lyrics)
+        if not song:
+            return error_response("Song not found", 404)
+        song = helper.project_song(song, fields)
+        return success_response(song, "Song retrieved successfully", max_age=1800)
+        
+    except Exception as e:
+        return error_response("Song lookup failed", 500, str(e))
+
+@app.route('/v2/albums/<album_id>')
+def get_album_clean(album_id):
+    try:
+        page = max(1, request.args.get('page', 1, type=int))
+        limit = max(1, min(request.args.get('limit', 50, type=int), 100))
+        include_lyrics = request.args.get('lyrics', 'false').lower() == 'true'
+        
+        album = jiosaavn.get_album_clean(album_id, page, limit, include_lyrics)
+        if not album:
+            return error_response("Album not found", 404)
+        meta = pagination_meta(page, limit, album["song_count"])
+        return success_response(album, "Album retrieved successfully", meta, max_age=3600)
+        
+    except Exception as e:
+        return error_response("Album lookup failed", 500, str(e))
+
+@app.route('/v2/playlists/<playlist_id>')
+def get_playlist_clean(playlist_id):
+    try:
+        page = max(1, request.args.get('page', 1, type=int))
+        limit = max(1, min(request.args.get('limit', 50, type=int), 100))
+        include_lyrics = request.args.get('lyrics', 'false').lower() == 'true'
+        
+        playlist = jiosaavn.get_playlist_clean(playlist_id, page, limit, include_lyrics)
+        if not playlist:
+            return error_response("Playlist not found", 404)
+        meta = pagination_meta(page, limit, playlist["song_count"])
+        return success_response(playlist, "Playlist retrieved successfully", meta, max_age=3600)
+        
+    except Exception as e:
+        return error_response("Playlist lookup failed", 500, str(e))
+
+def admin_allowed():
+    """Admin routes need an X-Admin-Token header matching ADMIN_TOKEN, and
+    are closed when ADMIN_TOKEN isn't set"""
+    token = os.environ.get("ADMIN_TOKEN")
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get("X-Admin-Token", "").encode(), token.encode())
+
+@app.route('/v2/admin/stats')
+def admin_stats():
+    if not admin_allowed():
+        return error_response("Unauthorized", 401)
+    return success_response({
+        "upstream": upstream.pool_stats(),
+        "upstream_health": upstream.health.stats(),
+        "cache": cache_stats(),
+        "song_batches": jiosaavn.song_batch_stats(),
+        "song_index": song_index.index.stats(),
+        "song_store": song_store.store.stats(),
+        "responses": response_cache_stats(),
+        "warmer": warmer.stats()
+    }, "Stats retrieved successfully")
+
+@app.route('/metrics')
+def prometheus_metrics():
+    if not admin_allowed():
+        return error_response("Unauthorized", 401)
+    cache = cache_stats()
+    pool = upstream.pool_stats()
+    batches = jiosaavn.song_batch_stats()
+    warming = warmer.stats()
+    upstream.health.export_metrics()
+    extra = [
+        ("jiosaavn_cache_entries", "gauge", "Entries in the in-process cache", cache["entries"]),
+        ("jiosaavn_cache_bytes", "gauge", "Estimated size of the in-process cache", cache["bytes"]),
+        ("jiosaavn_cache_hits_total", "counter", "In-process cache fresh hits", cache["hits"]),
+        ("jiosaavn_cache_stale_hits_total", "counter", "In-process cache stale hits", cache["stale_hits"]),
+        ("jiosaavn_cache_misses_total", "counter", "In-process cache misses", cache["misses"]),
+        ("jiosaavn_cache_evictions_total", "counter", "In-process cache evictions", cache["evictions"]),
+        ("jiosaavn_cache_coalesced_total", "counter", "Cache misses that waited on another caller", cache["coalesced"]),
+        ("jiosaavn_cache_refreshes_total", "counter", "Background refreshes of stale entries", cache["refreshes"]),
+        ("jiosaavn_upstream_connections_opened", "gauge", "Upstream connections opened by the pool", pool["connections_opened"]),
+        ("jiosaavn_upstream_connections_reused_total", "counter", "Upstream requests on a reused connection", pool["connections_reused"]),
+        ("jiosaavn_song_batches_total", "counter", "song.getDetails batches sent", batches["batches"]),
+        ("jiosaavn_song_batch_keys_total", "counter", "Song ids fetched in batches", batches["keys_fetched"]),
+        ("jiosaavn_song_index_songs", "gauge", "Songs in the local search index", song_index.index.stats()["songs"]),
+        ("jiosaavn_song_store_songs", "gauge", "Songs held once for all cached entries", len(song_store.store)),
+        ("jiosaavn_cache_warm_keys", "gauge", "Hot keys the warmer keeps refreshed", warming["hot"]),
+        ("jiosaavn_cache_warm_refreshes_total", "counter", "Cache entries refreshed ahead of expiry", warming["refreshes"]),
+    ]
+    return Response(metrics.render(extra), mimetype="text/plain; version=0.0.4")
+
+@app.route('/v2/admin/cache/clear', methods=['POST'])
+def admin_clear_cache():
+    if not admin_allowed():
+        return error_response("Unauthorized", 401)
+    clear_response_cache()
+    return success_response(clear_cache(), "Cache cleared")
+
 # ... (keep all your other routes unchanged) ...
+
+if __name__ == '__main__':
+    # Development server only; production runs under gunicorn (gunicorn.conf.py)
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), threaded=True,
+            debug=os.environ.get('FLASK_DEBUG') == '1')
@@ -0,0 +1,77 @@
+import threading
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Gather single-key lookups arriving within `window` seconds into one call.
+
+    `fetch_many(keys)` must return a dict of key -> value; keys missing from
+    it resolve to None. A batch is flushed when the window closes or as soon
+    as it holds `max_batch` distinct keys, whichever comes first.
+    """
+
+    def __init__(self, fetch_many, window=0.005, max_batch=50):
+        self.fetch_many = fetch_many
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = {}  # key -> [Future, ...]
+        self._timer = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.keys_fetched = 0
+        self.lookups = 0
+
+    def submit(self, key):
+        """Queue a lookup and return a Future for its value"""
+        future = Future()
+        with self._lock:
+            self.lookups += 1
+            self._pending.setdefault(key, []).append(future)
+            if len(self._pending) >= self.max_batch:
+                batch = self._take()
+            else:
+                batch = None
+                if self._timer is None:
+                    self._timer = threading.Timer(self.window, self._flush_timer)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if batch:
+            self._run(batch)
+        return future
+
+    def get(self, key, timeout=None):
+        return self.submit(key).result(timeout)
+
+    def stats(self):
+        return {
+            "lookups": self.lookups,
+            "batches": self.batches,
+            "keys_fetched": self.keys_fetched,
+        }
+
+    def _take(self):
+        batch, self._pending = self._pending, {}
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush_timer(self):
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._run(batch)
+
+    def _run(self, batch):
+        self.batches += 1
+        self.keys_fetched += len(batch)
+        try:
+            values = self.fetch_many(list(batch))
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+        for key, futures in batch.items():
+            for future in futures:
+                future.set_result(values.get(key))
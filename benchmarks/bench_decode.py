@@ -0,0 +1,89 @@
+"""Compare the legacy body decoding + string cleaning with the single-pass pipeline.
+
+Runs over recorded api.php payloads in benchmarks/fixtures and compares
+format_song_clean output both ways. The only expected differences are
+non-ASCII strings (e.g. the ℗ in copyrights) that the legacy unicode-escape
+round trip turned into mojibake; the "differs" column lists the fields
+where output differs. Media URL decryption is stubbed out in both runs so
+only decoding and string work is measured.
+
+    python benchmarks/bench_decode.py [--rounds 200]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import helper
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_decode(content):
+    text = content.decode('utf-8').encode().decode('unicode-escape')
+    text = re.sub(r'\(From "([^"]+)"\)', r"(From '\1')", text)
+    return json.loads(text)
+
+
+def legacy_format(string):
+    if not string:
+        return ""
+    return string.encode().decode('unicode-escape').replace("&quot;", "'").replace("&amp;", "&").replace("&#039;", "'")
+
+
+def legacy_format_copyright(string):
+    return legacy_format(string).replace("&copy;", "©").replace("&#169;", "©")
+
+
+def songs_of(data):
+    return data['results'] if 'results' in data else list(data.values())
+
+
+def run(content, decode):
+    return [helper.format_song_clean(song) for song in songs_of(decode(content))]
+
+
+def differing_fields(legacy_out, fast_out):
+    if len(legacy_out) != len(fast_out):
+        return ["song count"]
+    return sorted({name for old, new in zip(legacy_out, fast_out) for name in old if old[name] != new.get(name)})
+
+
+def bench(content, decode, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        run(content, decode)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    helper.decrypt_url = lambda url: "https://aac.saavncdn.com/stub_320.mp4"
+    fast_format, fast_copyright = helper.format, helper.format_copyright
+
+    print(f"{'fixture':<26}{'songs':>6}{'legacy ms':>12}{'fast ms':>10}{'speedup':>9}  differs")
+    for name in ["search_getresults.json", "song_details.json"]:
+        with open(os.path.join(FIXTURES, name), "rb") as f:
+            content = f.read()
+
+        helper.format, helper.format_copyright = legacy_format, legacy_format_copyright
+        legacy_out = run(content, legacy_decode)
+        legacy_ms = bench(content, legacy_decode, args.rounds)
+
+        helper.format, helper.format_copyright = fast_format, fast_copyright
+        fast_out = run(content, helper.decode_api_body)
+        fast_ms = bench(content, helper.decode_api_body, args.rounds)
+
+        print(f"{name:<26}{len(fast_out):>6}{legacy_ms:>12.3f}{fast_ms:>10.3f}"
+              f"{legacy_ms / fast_ms:>8.1f}x  {', '.join(differing_fields(legacy_out, fast_out)) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compare media URL decryption: the original per-call pyDes path vs helper.decrypt_url.
+
+Uses the encrypted_media_url values from the recorded search payload.
+
+    python benchmarks/bench_decrypt.py [--rounds 20]
+"""
+import argparse
+import base64
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyDes import des, ECB, PAD_PKCS5
+import helper
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_decrypt_url(url):
+    des_cipher = des(b"38346591", ECB, b"\0\0\0\0\0\0\0\0", pad=None, padmode=PAD_PKCS5)
+    enc_url = base64.b64decode(url.strip())
+    dec_url = des_cipher.decrypt(enc_url, padmode=PAD_PKCS5).decode('utf-8')
+    return dec_url.replace("_96.mp4", "_320.mp4")
+
+
+def clear_memo():
+    with helper._decrypt_memo_lock:
+        helper._decrypt_memo.clear()
+
+
+def bench(name, fn, urls, rounds, cold=True):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        if cold:
+            clear_memo()
+        fn(urls)
+    per_page = (time.perf_counter() - start) / rounds * 1000
+    print(f"{name:<34}{per_page:>10.3f} ms/page{per_page * 1000 / len(urls):>10.1f} us/url")
+    return per_page
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(os.path.join(FIXTURES, "search_getresults.json"), "rb") as f:
+        urls = [song['encrypted_media_url'] for song in helper.decode_api_body(f.read())['results']]
+
+    expected = [legacy_decrypt_url(url) for url in urls]
+    clear_memo()
+    assert [helper.decrypt_url(url) for url in urls] == expected
+    clear_memo()
+    batch = helper.decrypt_urls(urls)
+    assert [batch[url] for url in urls] == expected
+
+    print(f"{len(urls)} urls per page, backend: {'pycryptodome' if helper._DES else 'pyDes'}")
+    legacy = bench("legacy pyDes, new cipher per url", lambda u: [legacy_decrypt_url(x) for x in u], urls, args.rounds)
+    single = bench("decrypt_url, cold memo", lambda u: [helper.decrypt_url(x) for x in u], urls, args.rounds)
+    batched = bench("decrypt_urls batch, cold memo", helper.decrypt_urls, urls, args.rounds)
+    warm = bench("decrypt_urls batch, warm memo", helper.decrypt_urls, urls, args.rounds, cold=False)
+    print(f"speedup vs legacy: single {legacy / single:.0f}x, batch {legacy / batched:.0f}x, memoized {legacy / warm:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compare the legacy BeautifulSoup scrape path with the DOM-free extractor.
+
+Run from the repository root:
+
+    python benchmarks/bench_scrape.py [--rounds 50]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+import helper
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PAGES = ["search_page.html", "search_page_no_initial_data.html"]
+
+
+def legacy_extract(content):
+    """The original scrape_jiosaavn_search parsing, minus the HTTP call"""
+    soup = BeautifulSoup(content, 'html.parser')
+    for script in soup.find_all('script'):
+        if script.string and '__INITIAL_DATA__' in script.string:
+            json_match = re.search(r'__INITIAL_DATA__\s*=\s*({.*?});', script.string)
+            if json_match:
+                try:
+                    songs = helper.extract_songs_from_initial_data(json.loads(json_match.group(1)))
+                    if songs:
+                        return songs
+                except json.JSONDecodeError:
+                    continue
+    songs = []
+    for selector in ['[class*="song"]', '[class*="track"]', '[class*="result"]', '.song-list', '.track-list']:
+        for element in soup.select(selector):
+            song = helper.parse_song_from_element(element)
+            if song:
+                songs.append(song)
+    return songs
+
+
+def bench(fn, content, rounds):
+    songs = fn(content)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(content)
+    return (time.perf_counter() - start) / rounds * 1000, len(songs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'fixture':<36}{'path':<10}{'ms/page':>10}{'songs':>8}")
+    for name in PAGES:
+        with open(os.path.join(FIXTURES, name), "rb") as f:
+            content = f.read()
+        legacy_ms, legacy_songs = bench(legacy_extract, content, args.rounds)
+        fast_ms, fast_songs = bench(helper.extract_songs_from_page, content, args.rounds)
+        print(f"{name:<36}{'legacy':<10}{legacy_ms:>10.2f}{legacy_songs:>8}")
+        print(f"{'':<36}{'fast':<10}{fast_ms:>10.2f}{fast_songs:>8}  ({legacy_ms / fast_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
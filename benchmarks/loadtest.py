@@ -0,0 +1,265 @@
+"""Offline load test: the app under gunicorn against the local JioSaavn stub.
+
+For each gunicorn configuration (WORKERSxTHREADS) this starts a fresh app
+pointed at benchmarks/stub_server.py, drives it with concurrent clients for
+a fixed time and reports p50/p95/p99 latency, throughput, upstream calls per
+request and cache hit rate. Results are appended to a JSON file so runs can
+be compared over time.
+
+    python benchmarks/loadtest.py --configs 1x1,2x4,4x8 --duration 20 \\
+        --concurrency 32 --scenario mixed --latency-ms 80 --output bench_results.json
+
+    # gevent workers (the production default in gunicorn.conf.py); THREADS is ignored
+    python benchmarks/loadtest.py --configs 1x1,2x1 --worker-class gevent --concurrency 200
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from stub_server import start_stub_server, add_stub_arguments, stub_options
+
+# The app's admin routes are closed without a token, and the stats come from there
+ADMIN_TOKEN = "loadtest"
+ADMIN_HEADERS = {"X-Admin-Token": ADMIN_TOKEN}
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERIES = [
+    "arijit singh", "kesariya", "tum hi ho", "shreya ghoshal", "pritam", "channa mereya",
+    "ar rahman", "apna bana le", "hawayein", "raataan lambiyan", "neha kakkar", "atif aslam",
+    "jubin nautiyal", "sonu nigam", "agar tum saath ho", "tera ban jaunga", "kabir singh",
+    "brahmastra", "rockstar", "tamasha", "shershaah", "aashiqui 2", "sachin jigar", "vishal shekhar",
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Scenario:
+    """Picks request paths; queries follow a skewed (Zipf-like) popularity"""
+
+    def __init__(self, name, song_ids, seed=None):
+        self.name = name
+        self.song_ids = song_ids
+        self.random = random.Random(seed)
+        self.weights = [1 / (rank + 1) for rank in range(len(QUERIES))]
+
+    def query(self):
+        return self.random.choices(QUERIES, self.weights)[0]
+
+    def next_path(self):
+        kind = self.name
+        if kind == "mixed":
+            kind = self.random.choices(["search", "song", "bulk"], [0.7, 0.2, 0.1])[0]
+        if kind == "search":
+            page = self.random.choices([1, 2, 3], [0.75, 0.2, 0.05])[0]
+            return f"/v2/songs/search?query={self.query()}&page={page}&limit=20"
+        if kind == "song":
+            return f"/v2/songs/{self.random.choice(self.song_ids)}"
+        ids = ",".join(self.random.sample(self.song_ids, min(10, len(self.song_ids))))
+        return f"/v2/songs?ids={ids}"
+
+
+def start_app(workers, threads, worker_class, stub_url, cache_dir):
+    port = free_port()
+    env = dict(os.environ,
+               JIOSAAVN_BASE_URL=stub_url,
+               CACHE_PATH=os.path.join(cache_dir, "cache.sqlite3"),
+               SONG_INDEX_PATH="",
+               ADMIN_TOKEN=ADMIN_TOKEN,
+               # Background warming would add upstream calls of its own, and
+               # its snapshot must not leak into the next run
+               CACHE_WARM_ENABLED="false",
+               CACHE_WARM_PATH=os.path.join(cache_dir, "hot-keys.json"),
+               GUNICORN_WORKER_CLASS=worker_class or "sync",
+               PYTHONUNBUFFERED="1")
+    command = [sys.executable, "-m", "gunicorn", "app:app", "--bind", f"127.0.0.1:{port}",
+               "--workers", str(workers), "--threads", str(threads), "--timeout", "100",
+               "--log-level", "warning"]
+    if worker_class:
+        command += ["--worker-class", worker_class]
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(base_url + "/v2/admin/stats", headers=ADMIN_HEADERS, timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"gunicorn {workers}x{threads} did not start")
+
+
+def worker_stats(base_url, workers):
+    """Cache and pool stats summed over every worker that answers /v2/admin/stats"""
+    per_pid = {}
+    for _ in range(workers * 8):
+        try:
+            data = requests.get(base_url + "/v2/admin/stats", headers=ADMIN_HEADERS, timeout=5).json()["data"]
+        except (requests.RequestException, ValueError, KeyError):
+            continue
+        per_pid[data["upstream"]["pid"]] = data
+        if len(per_pid) == workers:
+            break
+    hits = sum(d["cache"]["hits"] + d["cache"].get("stale_hits", 0) for d in per_pid.values())
+    misses = sum(d["cache"]["misses"] for d in per_pid.values())
+    return {
+        "workers_sampled": len(per_pid),
+        "cache_hits": hits,
+        "cache_misses": misses,
+        "cache_hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+        "connections_opened": sum(d["upstream"]["connections_opened"] for d in per_pid.values()),
+        "connections_reused": sum(d["upstream"]["connections_reused"] for d in per_pid.values()),
+    }
+
+
+def drive(base_url, scenario_name, song_ids, concurrency, duration, seed):
+    """Hammer the app from `concurrency` client threads for `duration` seconds"""
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client(index):
+        session = requests.Session()
+        scenario = Scenario(scenario_name, song_ids, seed=None if seed is None else seed + index)
+        while time.time() < stop_at:
+            path = scenario.next_path()
+            start = time.perf_counter()
+            try:
+                status = session.get(base_url + path, timeout=60).status_code
+            except requests.RequestException:
+                status = "error"
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.time()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.time() - started
+
+
+def run_config(config, args, stub, stub_url, song_ids):
+    workers, threads = (int(part) for part in config.lower().split("x"))
+    worker_class = args.worker_class or ("gthread" if threads > 1 else "sync")
+    cache_dir = tempfile.mkdtemp(prefix="jiosaavn-bench-")
+    process, base_url = start_app(workers, threads, worker_class, stub_url, cache_dir)
+    try:
+        stub.state.reset()
+        latencies, statuses, elapsed = drive(base_url, args.scenario, song_ids,
+                                             args.concurrency, args.duration, args.seed)
+        upstream = stub.state.stats()
+        app_stats = worker_stats(base_url, workers)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    latencies.sort()
+    completed = len(latencies)
+    ok = statuses.get(200, 0)
+    return {
+        "config": config,
+        "workers": workers,
+        "threads": threads,
+        "worker_class": worker_class,
+        "requests": completed,
+        "errors": completed - ok,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "throughput_rps": round(completed / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "upstream_calls": upstream["total"],
+        "upstream_calls_per_request": round(upstream["total"] / completed, 3) if completed else None,
+        "upstream_by_call": upstream["calls"],
+        **app_stats,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configs", default="1x1,2x4", help="comma-separated WORKERSxTHREADS")
+    parser.add_argument("--worker-class", default=None, help="gunicorn worker class (default sync/gthread)")
+    parser.add_argument("--scenario", choices=["search", "song", "bulk", "mixed"], default="mixed")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per configuration")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent client threads")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_results.json", help="JSON file results are appended to")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub_server(**stub_options(args), seed=args.seed)
+    song_ids = list(stub.state.songs_by_id)
+
+    results = []
+    print(f"{'config':<8}{'class':<9}{'reqs':>7}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>6}{'up/req':>8}{'hit%':>7}")
+    for config in args.configs.split(","):
+        result = run_config(config.strip(), args, stub, stub_url, song_ids)
+        results.append(result)
+        latency = result["latency_ms"]
+        hit_rate = result["cache_hit_rate"]
+        print(f"{result['config']:<8}{result['worker_class']:<9}{result['requests']:>7}"
+              f"{result['throughput_rps']:>9.1f}{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}"
+              f"{result['errors']:>6}{result['upstream_calls_per_request']:>8.2f}"
+              f"{(hit_rate * 100 if hit_rate is not None else 0):>7.1f}")
+    stub.shutdown()
+
+    run = {
+        "timestamp": int(time.time()),
+        "commit": git_commit(),
+        "scenario": args.scenario,
+        "duration_s": args.duration,
+        "concurrency": args.concurrency,
+        "stub": stub_options(args),
+        "results": results,
+    }
+    history = []
+    if os.path.exists(args.output):
+        with open(args.output) as f:
+            history = json.load(f)
+    history.append(run)
+    with open(args.output, "w") as f:
+        json.dump(history, f, indent=2)
+    print(f"Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Local stand-in for www.jiosaavn.com that replays recorded responses.
+
+Serves /api.php (search.getResults, autocomplete.get, search.getTopQuery,
+song.getDetails, lyrics.getLyrics, content.getAlbumDetails,
+playlist.getDetails) and /search/<query> from benchmarks/fixtures, with
+configurable latency and failure injection. Point the app at it with
+JIOSAAVN_BASE_URL=http://127.0.0.1:<port>.
+
+    python benchmarks/stub_server.py --port 8900 --latency-ms 80 --fail-rate 0.02
+
+GET /__stats returns per-call request counts; POST /__reset zeroes them.
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+class StubState:
+    """Recorded payloads, fault settings and request counters"""
+
+    def __init__(self, latency_ms=50, jitter_ms=10, fail_rate=0.0, hang_rate=0.0,
+                 hang_ms=15000, call_latency=None, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fail_rate = fail_rate
+        self.hang_rate = hang_rate
+        self.hang_ms = hang_ms
+        self.call_latency = call_latency or {}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {}
+
+        search = json.loads(load_fixture("search_getresults.json"))
+        details = json.loads(load_fixture("song_details.json"))
+        self.total = search.get("total", len(search["results"]))
+        self.songs = search["results"] + list(details.values())
+        self.songs_by_id = {song["id"]: song for song in self.songs}
+        self.search_page = load_fixture("search_page.html")
+
+    def count(self, call):
+        with self.lock:
+            self.counts[call] = self.counts.get(call, 0) + 1
+
+    def stats(self):
+        with self.lock:
+            return {"total": sum(self.counts.values()), "calls": dict(self.counts)}
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+
+    def delay(self, call):
+        """Sleep for the call's latency; returns False to inject a failure"""
+        with self.lock:
+            roll = self.random.random()
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        if roll < self.hang_rate:
+            time.sleep(self.hang_ms / 1000)
+            return False
+        time.sleep(max(0, self.call_latency.get(call, self.latency_ms) + jitter) / 1000)
+        return roll >= self.hang_rate + self.fail_rate
+
+    def song(self, song_id):
+        """Recorded song for an id, or a recorded one re-labelled with it"""
+        song = self.songs_by_id.get(song_id)
+        if song is None:
+            song = copy.deepcopy(self.songs[zlib.crc32(song_id.encode()) % len(self.songs)])
+            song["id"] = song_id
+        return song
+
+    def api(self, call, params):
+        """JSON body for an api.php call"""
+        if call == "search.getResults":
+            page = max(1, int(params.get("p", ["1"])[0]))
+            limit = max(1, int(params.get("n", ["20"])[0]))
+            start = (page - 1) * limit
+            results = [self.songs[i % len(self.songs)] for i in range(start, min(start + limit, self.total))]
+            return {"total": self.total, "start": start + 1, "results": results}
+        if call == "autocomplete.get":
+            return {"songs": {"data": self.songs[:5], "position": 1}, "albums": {"data": []}}
+        if call == "search.getTopQuery":
+            return {"results": self.songs[:3]}
+        if call == "song.getDetails":
+            pids = params.get("pids", [""])[0].split(",")
+            return {song_id: self.song(song_id) for song_id in pids if song_id}
+        if call == "lyrics.getLyrics":
+            return {"lyrics": "Recorded lyrics line one<br>line two<br>line three", "lyrics_copyright": "Stub"}
+        if call == "content.getAlbumDetails":
+            album_id = params.get("albumid", [""])[0]
+            return {"albumid": album_id, "title": "Stub Album", "primary_artists": "Stub Artist",
+                    "year": "2020", "songs": self.songs[:15]}
+        if call == "playlist.getDetails":
+            playlist_id = params.get("listid", [""])[0]
+            return {"listid": playlist_id, "listname": "Stub Playlist", "firstname": "Stub",
+                    "follower_count": "42", "songs": [self.songs[i % len(self.songs)] for i in range(500)]}
+        return None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection pooling is exercised
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.server.state
+        url = urlsplit(self.path)
+        if url.path == "/__stats":
+            return self.send_body(200, json.dumps(state.stats()).encode())
+
+        if url.path == "/api.php":
+            params = parse_qs(url.query)
+            call = params.get("__call", [""])[0]
+        elif url.path.startswith("/search/"):
+            call = "search_page"
+        else:
+            return self.send_body(404, b"{}")
+
+        state.count(call)
+        if not state.delay(call):
+            return self.send_body(503, b"Service Unavailable", "text/plain")
+        if call == "search_page":
+            return self.send_body(200, state.search_page, "text/html; charset=utf-8")
+        data = state.api(call, params)
+        if data is None:
+            return self.send_body(404, b"{}")
+        return self.send_body(200, json.dumps(data, separators=(",", ":")).encode())
+
+    def do_POST(self):
+        if urlsplit(self.path).path == "/__reset":
+            self.server.state.reset()
+            return self.send_body(200, b"{}")
+        return self.send_body(404, b"{}")
+
+
+def start_stub_server(port=0, **options):
+    """Run a stub server on a background thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def add_stub_arguments(parser):
+    parser.add_argument("--latency-ms", type=float, default=50, help="base upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=10, help="+/- random latency")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of calls answered with 503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="fraction of calls that hang for --hang-ms")
+    parser.add_argument("--hang-ms", type=float, default=15000)
+    parser.add_argument("--call-latency", action="append", default=[], metavar="CALL=MS",
+                        help="per-call latency override, e.g. search_page=400")
+
+
+def stub_options(args):
+    return {
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "fail_rate": args.fail_rate,
+        "hang_rate": args.hang_rate,
+        "hang_ms": args.hang_ms,
+        "call_latency": {call: float(ms) for call, ms in (item.split("=", 1) for item in args.call_latency)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, **stub_options(args))
+    print(f"Stub JioSaavn listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,402 @@
+import os
+import sys
+import inspect
 import time
+import threading
+from collections import OrderedDict
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from cache_backends import get_backend
+import metrics
+import warmer
 
-# Simple in-memory cache
-cache_store = {}
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 5000))
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_SWEEP_INTERVAL = float(os.environ.get("CACHE_SWEEP_INTERVAL", 60))
 
-def cache_response(ttl=300):
+
+def estimate_size(obj):
+    """Rough deep size in bytes of a cached value (dicts, lists, strings)"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += estimate_size(k) + estimate_size(v)
+    elif isinstance(obj, (list, tuple, set)):
+        for item in obj:
+            size += estimate_size(item)
+    return size
+
+
+class LRUCache:
+    """Bounded in-memory cache with per-entry TTL and LRU eviction.
+
+    Entries are evicted least-recently-used first once either `max_entries`
+    or `max_bytes` is exceeded. Expired entries are removed on access and by
+    a sweep that runs at most every `sweep_interval` seconds during writes.
+    An entry stored with `stale_ttl` outlives its TTL by that many seconds,
+    during which `lookup` still returns it, flagged as stale.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+                 sweep_interval=CACHE_SWEEP_INTERVAL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._data = OrderedDict()  # key -> (value, fresh_until, size, expires_at)
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._last_sweep = time.time()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _count=False) is not None
+
+    def get(self, key, _count=True):
+        """Return the cached value, or None on a miss, stale or expired entry"""
+        found = self.lookup(key, _count)
+        if found is None or not found[1]:
+            return None
+        return found[0]
+
+    def lookup(self, key, _count=True):
+        """Return (value, is_fresh), or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[3] <= now:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                if _count:
+                    self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            fresh = entry[1] > now
+            if _count:
+                if fresh:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+            return entry[0], fresh
+
+    def fresh_for(self, key):
+        """Seconds until the entry goes stale (negative once it has), or None if absent"""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry[1] - time.time() if entry is not None else None
+
+    def set(self, key, value, ttl, stale_ttl=0):
+        size = estimate_size(value)
+        now = time.time()
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if size > self.max_bytes or now + ttl + stale_ttl <= now:
+                return
+            self._data[key] = (value, now + ttl, size, now + ttl + stale_ttl)
+            self._bytes += size
+            if now - self._last_sweep >= self.sweep_interval:
+                self.sweep(now)
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def sweep(self, now=None):
+        """Drop every expired entry; returns how many were removed"""
+        now = now or time.time()
+        with self._lock:
+            expired = [k for k, entry in self._data.items() if entry[3] <= now]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+            self._last_sweep = now
+            return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _remove(self, key):
+        size = self._data.pop(key)[2]
+        self._bytes -= size
+
+
+# In-process L1 cache, in front of the optional cross-worker L2 backend
+cache_store = LRUCache()
+shared_store = get_backend()
+
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get("CACHE_SINGLE_FLIGHT_TIMEOUT", 30))
+
+# Misses currently being computed, so concurrent callers share one computation
+_inflight = {}
+_inflight_lock = threading.Lock()
+_flight_stats = {"coalesced": 0, "refreshes": 0}
+_refresh_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("CACHE_REFRESH_WORKERS", 4)),
+                                       thread_name_prefix="cache-refresh")
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _cache_key(func, values):
+    return f"{func.__name__}:{values!r}"
+
+
+def _argument_binder(func, normalize):
+    """Map a call's (args, kwargs) to a tuple of every parameter's value.
+
+    Positional, keyword and defaulted spellings of the same call give the
+    same tuple; `normalize` maps parameter names to functions that
+    canonicalize their values (e.g. case and whitespace of a query).
+    Decorated functions can't take *args or **kwargs.
+    """
+    signature = inspect.signature(func)
+    parameters = list(signature.parameters)
+    normalizers = [(parameters.index(name), fn) for name, fn in (normalize or {}).items()]
+
+    def bind(args, kwargs):
+        if kwargs or len(args) != len(parameters):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            values = [bound.arguments[name] for name in parameters]
+        else:
+            values = list(args)
+        for index, fn in normalizers:
+            values[index] = fn(values[index])
+        return tuple(values)
+    return bind
+
+
+def _lookup(key, codec=None):
+    """Check L1 then L2; returns (value, is_fresh) or None"""
+    found = cache_store.lookup(key)
+    if found is not None and codec is not None:
+        value = codec.unpack(found[0])
+        if value is None:
+            # It referred to data the codec no longer has
+            cache_store.delete(key)
+            found = None
+        else:
+            found = value, found[1]
+    if found is not None or shared_store is None:
+        return found
+    with metrics.timed("cache_l2"):
+        shared = shared_store.get(key)
+    if shared is None:
+        return None
+    value, fresh_until, expires_at = shared
+    now = time.time()
+    cache_store.set(key, codec.pack(value) if codec else value, fresh_until - now, expires_at - fresh_until)
+    return value, fresh_until > now
+
+
+def _store(key, value, ttl, stale_ttl, codec=None):
+    # L1 holds the codec's compact form; L2 is shared, so it gets the full value
+    cache_store.set(key, codec.pack(value) if codec else value, ttl, stale_ttl)
+    if shared_store is not None:
+        now = time.time()
+        shared_store.set(key, value, now + ttl, now + ttl + stale_ttl)
+
+
+def _single_flight(key, load, codec=None, force=False):
+    """Run load() once for all concurrent callers of the same key.
+
+    With `force`, load() runs even if the key was cached meanwhile.
+    """
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+        else:
+            _flight_stats["coalesced"] += 1
+
+    if not leader:
+        if not flight.done.wait(SINGLE_FLIGHT_TIMEOUT):
+            # Leader is stuck; don't hold this request hostage to it
+            return load()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        # A previous flight may have filled the cache since our lookup missed
+        cached_data = None if force else cache_store.get(key, _count=False)
+        if cached_data is not None and codec is not None:
+            cached_data = codec.unpack(cached_data)
+        flight.result = cached_data if cached_data is not None else load()
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        flight.done.set()
+    return flight.result
+
+
+def _refresh_in_background(key, load, codec=None):
+    """Start one background refresh for a stale key, unless one is running"""
+    with _inflight_lock:
+        if key in _inflight:
+            return
+        _flight_stats["refreshes"] += 1
+
+    def refresh():
+        try:
+            _single_flight(key, load, codec)
+        except Exception as e:
+            print(f"Background refresh failed for {key}: {e}")
+
+    _refresh_executor.submit(refresh)
+
+
+def cache_response(ttl=300, stale_ttl=0, normalize=None, codec=None, warm=False, ttl_for=None):
+    """Cache a function's result for `ttl` seconds.
+
+    Calls are keyed on their bound arguments, so positional and keyword
+    spellings share an entry; `normalize` ({parameter: fn}) canonicalizes
+    argument values first, and the function is called with the normalized
+    values. Concurrent misses for the same key are coalesced into one call.
+    With `stale_ttl`, an expired result is still served for that many
+    seconds while a single background call refreshes it.
+
+    A `codec` (with pack(value) and unpack(packed)) changes how results are
+    held in the in-process cache, e.g. song_store's id-only forms; unpack
+    returning None counts as a miss.
+
+    With `warm`, calls are counted by warmer, which keeps the hottest keys
+    refreshed before they go stale and replays them in a new process.
+
+    `ttl_for(result)` can return a (ttl, stale_ttl) pair to cache a
+    particular result for a different time, or None for the defaults.
+    """
     def decorator(func):
+        bind = _argument_binder(func, normalize)
+
+        def store(key, result):
+            ttls = ttl_for(result) if ttl_for is not None else None
+            _store(key, result, *(ttls or (ttl, stale_ttl)), codec)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            key = f"{func.__name__}:{str(args)}:{str(kwargs)}"
-            
-            if key in cache_store:
-                cached_data, timestamp = cache_store[key]
-                if time.time() - timestamp < ttl:
-                    return cached_data
-            
-            result = func(*args, **kwargs)
-            cache_store[key] = (result, time.time())
-            return result
+            values = bind(args, kwargs)
+            key = _cache_key(func, values)
+            if warm:
+                warmer.touch(func.__name__, values)
+
+            def load():
+                with metrics.timed("miss." + func.__name__):
+                    result = func(*values)
+                if result is not None:
+                    store(key, result)
+                return result
+
+            found = _lookup(key, codec)
+            if found is not None:
+                cached_data, fresh = found
+                metrics.cache_lookups.inc(func.__name__, "hit" if fresh else "stale")
+                if not fresh:
+                    _refresh_in_background(key, load, codec)
+                return cached_data
+
+            metrics.cache_lookups.inc(func.__name__, "miss")
+            return _single_flight(key, load, codec)
+
+        def cached(*args, **kwargs):
+            """Cached result for these arguments (fresh or stale), or None"""
+            found = _lookup(_cache_key(func, bind(args, kwargs)), codec)
+            return found[0] if found is not None else None
+
+        def prime(value, *args, **kwargs):
+            """Store a result for these arguments computed elsewhere"""
+            if value is not None:
+                store(_cache_key(func, bind(args, kwargs)), value)
+
+        def fresh_for(*args, **kwargs):
+            """Seconds until the in-process result goes stale, or None if not cached"""
+            return cache_store.fresh_for(_cache_key(func, bind(args, kwargs)))
+
+        def _loader(values, key):
+            def load():
+                result = func(*values)
+                if result is not None:
+                    store(key, result)
+                return result
+            return load
+
+        def fill(*args, **kwargs):
+            """Cached result, computed and stored on a miss. Unlike a call,
+            it isn't counted as a lookup or by warmer."""
+            values = bind(args, kwargs)
+            key = _cache_key(func, values)
+            found = _lookup(key, codec)
+            if found is not None:
+                return found[0]
+            return _single_flight(key, _loader(values, key), codec)
+
+        def refresh(*args, **kwargs):
+            """Recompute and store the result now, even if the cached one is fresh"""
+            values = bind(args, kwargs)
+            key = _cache_key(func, values)
+            return _single_flight(key, _loader(values, key), codec, force=True)
+
+        wrapper.cached = cached
+        wrapper.prime = prime
+        wrapper.fresh_for = fresh_for
+        wrapper.fill = fill
+        wrapper.refresh = refresh
+        if warm:
+            warmer.register(func.__name__, wrapper)
         return wrapper
     return decorator
 
+def cache_stats():
+    """Hit/miss/eviction counters for the L1 cache and the shared backend"""
+    stats = cache_store.stats()
+    stats.update(_flight_stats)
+    stats["shared"] = shared_store.stats() if shared_store is not None else None
+    return stats
+
 def clear_cache():
-    """Clear all cached data"""
+    """Clear all cached data and return the stats from before clearing"""
+    stats = cache_stats()
     cache_store.clear()
+    if shared_store is not None:
+        shared_store.clear()
+    return stats
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Shared (L2) cache backends that sit behind the in-process LRUCache.
+# They need no external service: every gunicorn worker on the host opens the
+# same local file, so one worker's upstream fetch warms all the others and
+# survives restarts and deploys on the same disk.
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "sqlite")
+CACHE_PATH = os.environ.get("CACHE_PATH", os.path.join(tempfile.gettempdir(), "jiosaavn-cache.sqlite3"))
+CACHE_L2_MAX_ROWS = int(os.environ.get("CACHE_L2_MAX_ROWS", 50000))
+CACHE_L2_SWEEP_INTERVAL = float(os.environ.get("CACHE_L2_SWEEP_INTERVAL", 300))
+CACHE_L2_IDLE_CONNECTIONS = int(os.environ.get("CACHE_L2_IDLE_CONNECTIONS", 8))
+
+
+def dumps(value):
+    """Serialize a cached value (JSON, compact UTF-8)"""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def loads(blob):
+    return json.loads(blob)
+
+
+class SQLiteBackend:
+    """Cross-process cache in a SQLite database running in WAL mode.
+
+    WAL lets every worker read concurrently while one writes. Connections
+    are pooled per process rather than held per thread, so short-lived
+    threads or greenlets (gevent workers) reuse them instead of opening one
+    each; the pool is dropped after a fork.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_rows=CACHE_L2_MAX_ROWS,
+                 sweep_interval=CACHE_L2_SWEEP_INTERVAL, idle_connections=CACHE_L2_IDLE_CONNECTIONS):
+        self.path = path
+        self.max_rows = max_rows
+        self.sweep_interval = sweep_interval
+        self.idle_connections = idle_connections
+        self._idle = []
+        self._pool_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._last_sweep = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        with self._connection() as conn:
+            self._create_table(conn)
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _create_table(self, conn):
+        # It's only a cache: drop tables written in an older layout
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(cache)")}
+        if columns and "fresh_until" not in columns:
+            conn.execute("DROP TABLE cache")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " fresh_until REAL NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires_at)")
+
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection for one statement or a few"""
+        pid = os.getpid()
+        with self._pool_lock:
+            if self._pid != pid:
+                self._idle = []  # the parent's connections aren't safe to share
+                self._pid = pid
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            with self._pool_lock:
+                if self._pid == pid and len(self._idle) < self.idle_connections:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def get(self, key):
+        """Return (value, fresh_until, expires_at) or None"""
+        try:
+            with self._connection() as conn:
+                row = conn.execute(
+                    "SELECT value, fresh_until, expires_at FROM cache WHERE key = ? AND expires_at > ?",
+                    (key, time.time())
+                ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value = loads(row[0])
+        except Exception as e:
+            self.errors += 1
+            print(f"Cache backend read failed: {e}")
+            return None
+        self.hits += 1
+        return value, row[1], row[2]
+
+    def set(self, key, value, fresh_until, expires_at):
+        """Store a value; it is served as stale between fresh_until and expires_at"""
+        try:
+            blob = dumps(value)
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, fresh_until, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, blob, fresh_until, expires_at)
+                )
+                if time.time() - self._last_sweep >= self.sweep_interval:
+                    self.sweep(conn)
+        except Exception as e:
+            self.errors += 1
+            print(f"Cache backend write failed: {e}")
+
+    def delete(self, key):
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        except Exception as e:
+            self.errors += 1
+            print(f"Cache backend delete failed: {e}")
+
+    def sweep(self, conn=None):
+        """Delete expired rows, then the soonest-to-expire rows over max_rows"""
+        if conn is None:
+            with self._connection() as conn:
+                return self.sweep(conn)
+        self._last_sweep = time.time()
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (self._last_sweep,))
+        conn.execute(
+            "DELETE FROM cache WHERE key IN ("
+            " SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,)
+        )
+
+    def clear(self):
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM cache")
+        except Exception as e:
+            self.errors += 1
+            print(f"Cache backend clear failed: {e}")
+
+    def stats(self):
+        try:
+            with self._connection() as conn:
+                rows = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        except Exception:
+            rows = None
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "rows": rows,
+            "max_rows": self.max_rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+def get_backend(name=CACHE_BACKEND):
+    """Build the configured shared backend; None means in-process cache only"""
+    if not name or name == "memory":
+        return None
+    if name == "sqlite":
+        try:
+            return SQLiteBackend()
+        except Exception as e:
+            print(f"Shared cache disabled, could not open {CACHE_PATH}: {e}")
+            return None
+    raise ValueError(f"Unknown CACHE_BACKEND: {name}")
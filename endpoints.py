@@ -1,15 +1,24 @@
 # endpoints.py - COMPLETE REPLACEMENT
+import os
+
+# Point at a local stand-in server for offline benchmarks (see benchmarks/)
+base_url = os.environ.get("JIOSAAVN_BASE_URL", "https://www.jiosaavn.com").rstrip("/")
 
 # Try multiple search endpoints
-search_base_url = "https://www.jiosaavn.com/api.php?__call=autocomplete.get&_format=json&_marker=0&cc=in&includeMetaTags=1&query="
+search_base_url = base_url + "/api.php?__call=autocomplete.get&_format=json&_marker=0&cc=in&includeMetaTags=1&query="
 
-search_songs_base_url = "https://www.jiosaavn.com/api.php?__call=search.getResults&_format=json&_marker=0&cc=in&p={page}&n={limit}&q="
+search_songs_base_url = base_url + "/api.php?__call=search.getResults&_format=json&_marker=0&cc=in&p={page}&n={limit}&q="
 
 # Alternative endpoints
-search_alt_url = "https://www.jiosaavn.com/api.php?__call=search.getResults&_format=json&_marker=0&cc=in&p={page}&n={limit}&_format=json&__src=web&q="
+search_alt_url = base_url + "/api.php?__call=search.getResults&_format=json&_marker=0&cc=in&p={page}&n={limit}&_format=json&__src=web&q="
+
+search_top_query_base_url = base_url + "/api.php?__call=search.getTopQuery&_format=json&query="
+
+# Website search page, used for scraping
+search_page_base_url = base_url + "/search/"
 
 # Other endpoints (keep as is)
-song_details_base_url = "https://www.jiosaavn.com/api.php?__call=song.getDetails&cc=in&_marker=0%3F_marker%3D0&_format=json&pids="
-album_details_base_url = "https://www.jiosaavn.com/api.php?__call=content.getAlbumDetails&_format=json&cc=in&_marker=0%3F_marker%3D0&albumid="
-playlist_details_base_url = "https://www.jiosaavn.com/api.php?__call=playlist.getDetails&_format=json&cc=in&_marker=0%3F_marker%3D0&listid="
-lyrics_base_url = "https://www.jiosaavn.com/api.php?__call=lyrics.getLyrics&ctx=web6dot0&api_version=4&_format=json&_marker=0%3F_marker%3D0&lyrics_id="
+song_details_base_url = base_url + "/api.php?__call=song.getDetails&cc=in&_marker=0%3F_marker%3D0&_format=json&pids="
+album_details_base_url = base_url + "/api.php?__call=content.getAlbumDetails&_format=json&cc=in&_marker=0%3F_marker%3D0&albumid="
+playlist_details_base_url = base_url + "/api.php?__call=playlist.getDetails&_format=json&cc=in&_marker=0%3F_marker%3D0&listid="
+lyrics_base_url = base_url + "/api.php?__call=lyrics.getLyrics&ctx=web6dot0&api_version=4&_format=json&_marker=0%3F_marker%3D0&lyrics_id="
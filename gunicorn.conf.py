@@ -0,0 +1,30 @@
+import os
+import multiprocessing
+
+# Production server settings, picked up automatically by `gunicorn app:app`.
+#
+# Handlers spend nearly all their time waiting on jiosaavn.com, so by default
+# each worker is a gevent worker: every request runs in a greenlet and the
+# upstream fan-out (hedged search endpoints, scraping, lyrics, batched song
+# lookups) yields while it waits on the network, letting one process hold
+# hundreds of slow requests instead of one per worker.
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gevent")
+workers = int(os.environ.get("WEB_CONCURRENCY", min(4, multiprocessing.cpu_count() * 2)))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 100))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", None)
+errorlog = "-"
+
+if worker_class == "gevent":
+    # The fan-out pools and the upstream connection pool are sized for a
+    # handful of threads; with greenlets they're cheap, so let them grow with
+    # the number of requests in flight (explicit settings still win)
+    os.environ.setdefault("SEARCH_HEDGE_WORKERS", "200")
+    os.environ.setdefault("SEARCH_SOURCE_WORKERS", "200")
+    os.environ.setdefault("LYRICS_MAX_WORKERS", "100")
+    os.environ.setdefault("CACHE_REFRESH_WORKERS", "20")
+    os.environ.setdefault("UPSTREAM_POOL_MAXSIZE", "100")
@@ -0,0 +1,188 @@
+import os
+import time
+import threading
+from collections import deque
+import metrics
+
+# Upstream health per endpoint (api.php __call, or "scrape"): a rolling window
+# of recent outcomes drives a circuit breaker, so an endpoint that keeps
+# failing is skipped and only probed now and then, and a read timeout derived
+# from the endpoint's own latency instead of one fixed value for everything.
+
+HEALTH_WINDOW = int(os.environ.get("UPSTREAM_HEALTH_WINDOW", 50))
+BREAKER_MIN_REQUESTS = int(os.environ.get("BREAKER_MIN_REQUESTS", 10))
+BREAKER_ERROR_RATE = float(os.environ.get("BREAKER_ERROR_RATE", 0.5))
+BREAKER_CONSECUTIVE_FAILURES = int(os.environ.get("BREAKER_CONSECUTIVE_FAILURES", 5))
+BREAKER_COOLDOWN = float(os.environ.get("BREAKER_COOLDOWN", 30))
+BREAKER_MAX_COOLDOWN = float(os.environ.get("BREAKER_MAX_COOLDOWN", 600))
+
+# Read timeout = p95 of recent successful calls x multiplier, within bounds
+TIMEOUT_MULTIPLIER = float(os.environ.get("UPSTREAM_TIMEOUT_MULTIPLIER", 3))
+TIMEOUT_MIN = float(os.environ.get("UPSTREAM_TIMEOUT_MIN", 1.5))
+TIMEOUT_MIN_SAMPLES = 20
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+breaker_state = metrics.Gauge("jiosaavn_upstream_breaker_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)", ("endpoint",))
+endpoint_error_rate = metrics.Gauge("jiosaavn_upstream_error_rate", "Failure rate over the rolling window", ("endpoint",))
+endpoint_timeout = metrics.Gauge("jiosaavn_upstream_timeout_seconds", "Current adaptive read timeout", ("endpoint",))
+breaker_rejected = metrics.Counter("jiosaavn_upstream_breaker_rejected_total", "Calls skipped because the breaker was open", ("endpoint",))
+
+
+class EndpointHealth:
+    """Rolling outcomes and circuit breaker for one upstream endpoint.
+
+    The breaker opens when at least BREAKER_MIN_REQUESTS of the last
+    HEALTH_WINDOW calls include BREAKER_ERROR_RATE failures, or after
+    BREAKER_CONSECUTIVE_FAILURES in a row. Once the cooldown passes it goes
+    half-open and lets one probe through: success closes it, failure opens
+    it again with the cooldown doubled (up to BREAKER_MAX_COOLDOWN).
+    """
+
+    def __init__(self, name, max_timeout):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.outcomes = deque(maxlen=HEALTH_WINDOW)   # True for success
+        self.latencies = deque(maxlen=HEALTH_WINDOW)  # seconds, successes only
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.cooldown = BREAKER_COOLDOWN
+        self.consecutive_failures = 0
+        self.probing = False
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+        self._timeout = max_timeout
+        self._timeout_stale = True
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        """Whether calls would be rejected right now (doesn't take a probe slot)"""
+        with self._lock:
+            if self.state == OPEN:
+                return time.time() - self.opened_at < self.cooldown
+            return self.state == HALF_OPEN and self.probing
+
+    def allow(self):
+        """Whether a call may go ahead; in half-open state only one probe may"""
+        with self._lock:
+            if self.state == OPEN and time.time() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            self.rejected += 1
+            breaker_rejected.inc(self.name)
+            return False
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.requests += 1
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(latency)
+                self._timeout_stale = True
+                self.consecutive_failures = 0
+                if self.state == HALF_OPEN:
+                    self._close()
+                return
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                self._open(self.cooldown * 2)
+            elif self.state == CLOSED and self._should_open():
+                self._open(BREAKER_COOLDOWN)
+
+    def timeout(self):
+        """Read timeout for the next call"""
+        with self._lock:
+            if self._timeout_stale:
+                self._timeout_stale = False
+                if len(self.latencies) >= TIMEOUT_MIN_SAMPLES:
+                    timeout = self._percentile(0.95) * TIMEOUT_MULTIPLIER
+                    self._timeout = min(self.max_timeout, max(TIMEOUT_MIN, timeout))
+                else:
+                    self._timeout = self.max_timeout
+            return self._timeout
+
+    def stats(self):
+        with self._lock:
+            state = self.state
+            if state == OPEN and time.time() - self.opened_at >= self.cooldown:
+                state = HALF_OPEN
+            outcomes = len(self.outcomes)
+            return {
+                "state": state,
+                "requests": self.requests,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened,
+                "error_rate": round(self.outcomes.count(False) / outcomes, 4) if outcomes else 0.0,
+                "p50_ms": round(self._percentile(0.50) * 1000, 1) if self.latencies else None,
+                "p95_ms": round(self._percentile(0.95) * 1000, 1) if self.latencies else None,
+                "timeout_s": round(self._timeout, 3),
+                "cooldown_s": self.cooldown,
+            }
+
+    def _should_open(self):
+        if self.consecutive_failures >= BREAKER_CONSECUTIVE_FAILURES:
+            return True
+        if len(self.outcomes) < BREAKER_MIN_REQUESTS:
+            return False
+        return self.outcomes.count(False) / len(self.outcomes) >= BREAKER_ERROR_RATE
+
+    def _open(self, cooldown):
+        self.state = OPEN
+        self.opened_at = time.time()
+        self.cooldown = min(cooldown, BREAKER_MAX_COOLDOWN)
+        self.probing = False
+        self.times_opened += 1
+        print(f"Circuit open for {self.name} ({self.cooldown:.0f}s)")
+
+    def _close(self):
+        self.state = CLOSED
+        self.cooldown = BREAKER_COOLDOWN
+        self.probing = False
+        self.outcomes.clear()
+        print(f"Circuit closed for {self.name}")
+
+    def _percentile(self, fraction):
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class HealthRegistry:
+    """EndpointHealth for every endpoint seen so far in this worker"""
+
+    def __init__(self, max_timeout):
+        self.max_timeout = max_timeout
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        endpoint = self._endpoints.get(name)
+        if endpoint is None:
+            with self._lock:
+                endpoint = self._endpoints.setdefault(name, EndpointHealth(name, self.max_timeout))
+        return endpoint
+
+    def is_open(self, name):
+        endpoint = self._endpoints.get(name)
+        return endpoint is not None and endpoint.is_open()
+
+    def stats(self):
+        with self._lock:
+            endpoints = dict(self._endpoints)
+        return {name: endpoint.stats() for name, endpoint in sorted(endpoints.items())}
+
+    def export_metrics(self):
+        """Copy the current breaker state into the /metrics gauges"""
+        for name, stats in self.stats().items():
+            breaker_state.set(STATE_VALUES[stats["state"]], name)
+            endpoint_error_rate.set(stats["error_rate"], name)
+            endpoint_timeout.set(stats["timeout_s"], name)
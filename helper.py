@@ -1,71 +1,149 @@
 import base64
-import requests
+import hashlib
+import os
+import time
+import threading
+import endpoints
+import upstream
+import song_index
+import song_store
+import metrics
+from collections import OrderedDict
 from pyDes import *
 from bs4 import BeautifulSoup
 import json
 import re
+import unicodedata
 
-def format_song_clean(data):
-    """Transform song data to clean format - UPDATED FOR HYBRID SEARCH"""
+try:
+    from Crypto.Cipher import DES as _DES
+except ImportError:
+    _DES = None
+
+# Fields of a clean-format song, in output order. "lyrics" can also be
+# requested with fields=, but is attached separately (lyrics.attach_lyrics).
+SONG_FIELDS = song_store.FIELDS
+EXTRA_FIELDS = ("lyrics",)
+
+def _song_media_url(data):
+    media_url = data.get('media_url') or data.get('media_preview_url', '')
+    
+    # Get media URL with fallback
+    if not media_url or 'preview' in media_url:
+        try:
+            encrypted_url = data.get('encrypted_media_url')
+            if encrypted_url:
+                media_url = decrypt_url(encrypted_url)
+        except:
+            media_url = data.get('media_preview_url', '').replace("preview", "aac").replace("_96_p.mp4", "_160.mp4")
+    
+    # Ensure best available quality
+    if media_url and data.get('320kbps') != "true" and "_320.mp4" in media_url:
+        media_url = media_url.replace("_320.mp4", "_160.mp4")
+    return media_url
+
+def _song_artists(data):
+    artists = []
+    if 'artists' in data and data['artists']:
+        if isinstance(data['artists'], list):
+            artists = [format(artist) for artist in data['artists'] if artist]
+        else:
+            artists = [format(data['artists'])]
+    elif 'primary_artists' in data and data['primary_artists']:
+        artists = [format(artist.strip()) for artist in data['primary_artists'].split(',') if artist.strip()]
+    elif 'singers' in data and data['singers']:
+        artists = [format(singer.strip()) for singer in data['singers'].split(',') if singer.strip()]
+    
+    # Remove duplicates
+    return list(dict.fromkeys(artists))
+
+def _song_title(data):
+    return data.get('song') or data.get('title') or ''
+
+def _song_id(data):
+    if data.get('id'):
+        return data['id']
+    if data.get('perma_url'):
+        return data['perma_url'].split('/')[-1]
+    # Stable across processes (unlike hash()), since ids key the song store
+    # and the index and warmer snapshots
+    return hashlib.blake2b(_song_title(data).encode('utf-8'), digest_size=8).hexdigest()
+
+def _song_duration(data):
+    duration_sec = data.get('duration_sec')
+    if not duration_sec:
+        duration_sec = convert_duration(data.get('duration', '0'))
+    return duration_sec
+
+# How each clean field is computed from a raw API or scraped song
+_SONG_FIELD_FORMATTERS = {
+    "id": _song_id,
+    "song": lambda data: format(_song_title(data)),
+    "artists": _song_artists,
+    "album": lambda data: format(data.get('album', '')),
+    "year": lambda data: data.get('year', ''),
+    "language": lambda data: format(data.get('language', '')).title(),
+    "duration_sec": _song_duration,
+    "play_count": lambda data: safe_int(data.get('play_count', 0)),
+    "image": lambda data: data.get('image', '').replace("150x150", "500x500"),
+    "media_url": _song_media_url,
+    "perma_url": lambda data: data.get('perma_url', ''),
+    "copyright": lambda data: format_copyright(data.get('copyright_text', '')),
+    "lyrics_id": lambda data: data.get('lyrics_id') if data.get('has_lyrics') == 'true' else None,
+}
+
+def normalize_fields(fields):
+    """Canonical tuple of requested song fields, or None for all of them.
+
+    Accepts a comma-separated string or an iterable. id is always
+    included, and lyrics brings lyrics_id with it. Raises ValueError on
+    an unknown field.
+    """
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    requested = {field.strip() for field in fields if field and field.strip()}
+    if not requested:
+        return None
+    unknown = requested.difference(SONG_FIELDS, EXTRA_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.add("id")
+    if "lyrics" in requested:
+        requested.add("lyrics_id")
+    return tuple(field for field in SONG_FIELDS + EXTRA_FIELDS if field in requested)
+
+def project_song(song, fields):
+    """Just the requested fields of a clean song (all of it for fields=None)"""
+    if fields is None or not song:
+        return song
+    return {field: song.get(field) for field in fields if field in song or field in SONG_FIELDS}
+
+def has_title(data):
+    """Whether a raw song would format with a title (songs without one are dropped)"""
+    return bool(data and _song_title(data))
+
+@metrics.timed_function("format")
+def format_song_clean(data, fields=None):
+    """Transform song data to clean format - UPDATED FOR HYBRID SEARCH
+
+    With `fields` (see normalize_fields), only those fields are computed,
+    so e.g. a list view that doesn't ask for media_url never decrypts it.
+    """
     if not data:
         return None
     
     try:
-        # Handle different data structures from API vs scraping
-        media_url = data.get('media_url') or data.get('media_preview_url', '')
-        
-        # Get media URL with fallback
-        if not media_url or 'preview' in media_url:
-            try:
-                encrypted_url = data.get('encrypted_media_url')
-                if encrypted_url:
-                    media_url = decrypt_url(encrypted_url)
-            except:
-                media_url = data.get('media_preview_url', '').replace("preview", "aac").replace("_96_p.mp4", "_160.mp4")
-        
-        # Ensure best available quality
-        if media_url and data.get('320kbps') != "true" and "_320.mp4" in media_url:
-            media_url = media_url.replace("_320.mp4", "_160.mp4")
-        
-        # Extract artists properly
-        artists = []
-        if 'artists' in data and data['artists']:
-            if isinstance(data['artists'], list):
-                artists = [format(artist) for artist in data['artists'] if artist]
-            else:
-                artists = [format(data['artists'])]
-        elif 'primary_artists' in data and data['primary_artists']:
-            artists = [format(artist.strip()) for artist in data['primary_artists'].split(',') if artist.strip()]
-        elif 'singers' in data and data['singers']:
-            artists = [format(singer.strip()) for singer in data['singers'].split(',') if singer.strip()]
-        
-        # Remove duplicates
-        artists = list(dict.fromkeys(artists))
-        
-        # Get song title
-        song_title = data.get('song') or data.get('title') or ''
-        
-        # Format duration
-        duration_sec = data.get('duration_sec')
-        if not duration_sec:
-            duration_str = data.get('duration', '0')
-            duration_sec = convert_duration(duration_str)
-        
-        return {
-            "id": data.get('id') or data.get('perma_url', '').split('/')[-1] if data.get('perma_url') else str(hash(song_title)),
-            "song": format(song_title),
-            "artists": artists,
-            "album": format(data.get('album', '')),
-            "year": data.get('year', ''),
-            "language": format(data.get('language', '')).title(),
-            "duration_sec": duration_sec,
-            "play_count": safe_int(data.get('play_count', 0)),
-            "image": data.get('image', '').replace("150x150", "500x500"),
-            "media_url": media_url,
-            "perma_url": data.get('perma_url', ''),
-            "copyright": format(data.get('copyright_text', '')).replace("&copy;", "©").replace("&#169;", "©"),
-            "lyrics_id": data.get('lyrics_id') if data.get('has_lyrics') == 'true' else None
-        }
+        if fields is not None:
+            # Partial songs stay out of the index and the song store, whose
+            # records must hold every field
+            return {name: formatter(data) for name, formatter in _SONG_FIELD_FORMATTERS.items()
+                    if name in fields}
+        clean_data = {name: formatter(data) for name, formatter in _SONG_FIELD_FORMATTERS.items()}
+        song_store.store.merge(clean_data)
+        song_index.index.add(clean_data)
+        return clean_data
     
     except Exception as e:
         print(f"Error formatting song: {e}")
@@ -91,77 +169,246 @@ def safe_int(value, default=0):
     except:
         return default
 
+# Entities cleaned by format(), as one pattern. "&amp;#039;" is listed
+# because replacing &amp; and then &#039; in turn used to turn it into "'".
+_ENTITIES = {"&amp;#039;": "'", "&quot;": "'", "&amp;": "&", "&#039;": "'"}
+_ENTITY_PATTERN = re.compile("|".join(map(re.escape, _ENTITIES)))
+_COPYRIGHT_PATTERN = re.compile("&copy;|&#169;")
+
 def format(string):
     """Clean and format strings"""
     if not string:
         return ""
-    return string.encode().decode('unicode-escape').replace("&quot;", "'").replace("&amp;", "&").replace("&#039;", "'")
+    # Only strings with a backslash have escapes to undo. Going through
+    # latin-1 with backslashreplace keeps non-ASCII text intact (encoding to
+    # UTF-8 first would turn e.g. Hindi titles into mojibake)
+    if '\\' in string:
+        string = string.encode('latin-1', 'backslashreplace').decode('unicode-escape')
+    if '&' in string:
+        string = _ENTITY_PATTERN.sub(lambda match: _ENTITIES[match.group()], string)
+    return string
+
+def normalize_query(query):
+    """Canonical form of a search query: NFKC, casefolded, single-spaced"""
+    return " ".join(unicodedata.normalize("NFKC", query or "").casefold().split())
+
+def format_copyright(string):
+    """format() plus the copyright sign entities"""
+    string = format(string)
+    if '&' in string:
+        string = _COPYRIGHT_PATTERN.sub("©", string)
+    return string
+
+# JioSaavn escapes quotes in titles like `(From \"Movie\")`; keep the
+# single-quoted form clients have always received
+_FROM_QUOTES = re.compile(rb'\(From \\"([^"\\]+)\\"\)')
+
+@metrics.timed_function("json")
+def decode_api_body(content):
+    """Decode an api.php response body in one pass"""
+    if b'(From \\"' in content:
+        content = _FROM_QUOTES.sub(rb"(From '\1')", content)
+    return json.loads(content)
+
+# Media URL decryption. pycryptodome's C DES is used when installed, else
+# pyDes. Ciphers are reused per thread and results memoized, since the same
+# encrypted URL turns up again and again across searches.
+_DES_KEY = b"38346591"
+DECRYPT_MEMO_SIZE = int(os.environ.get("DECRYPT_MEMO_SIZE", 20000))
+_cipher_local = threading.local()
+_decrypt_memo = OrderedDict()
+_decrypt_memo_lock = threading.Lock()
+
+def _des_decrypt_blocks(data):
+    """Raw DES-ECB decrypt, no unpadding"""
+    cipher = getattr(_cipher_local, 'fast', None)
+    if cipher is None:
+        cipher = _cipher_local.fast = _DES.new(_DES_KEY, _DES.MODE_ECB)
+    return cipher.decrypt(data)
+
+def _des_decrypt(data):
+    """DES-ECB decrypt and strip PKCS5 padding"""
+    if _DES is not None:
+        plain = _des_decrypt_blocks(data)
+        return plain[:-plain[-1]]
+    cipher = getattr(_cipher_local, 'pydes', None)
+    if cipher is None:
+        cipher = _cipher_local.pydes = des(_DES_KEY, ECB, b"\0\0\0\0\0\0\0\0", pad=None, padmode=PAD_PKCS5)
+    return cipher.decrypt(data, padmode=PAD_PKCS5)
+
+def _memo_get(url):
+    with _decrypt_memo_lock:
+        dec_url = _decrypt_memo.get(url)
+        if dec_url is not None:
+            _decrypt_memo.move_to_end(url)
+        return dec_url
+
+def _memo_set(url, dec_url):
+    with _decrypt_memo_lock:
+        _decrypt_memo[url] = dec_url
+        if len(_decrypt_memo) > DECRYPT_MEMO_SIZE:
+            _decrypt_memo.popitem(last=False)
+
+def _finish_url(plain):
+    return plain.decode('utf-8').replace("_96.mp4", "_320.mp4")
 
 def decrypt_url(url):
     """Decrypt encrypted media URL"""
+    dec_url = _memo_get(url)
+    if dec_url is not None:
+        return dec_url
     try:
-        des_cipher = des(b"38346591", ECB, b"\0\0\0\0\0\0\0\0", pad=None, padmode=PAD_PKCS5)
-        enc_url = base64.b64decode(url.strip())
-        dec_url = des_cipher.decrypt(enc_url, padmode=PAD_PKCS5).decode('utf-8')
-        dec_url = dec_url.replace("_96.mp4", "_320.mp4")
+        with metrics.timed("decrypt"):
+            dec_url = _finish_url(_des_decrypt(base64.b64decode(url.strip())))
+        _memo_set(url, dec_url)
         return dec_url
     except Exception as e:
         print(f"Decryption error: {e}")
         return ""
 
+def decrypt_urls(urls):
+    """Decrypt a page of encrypted media URLs; returns {url: decrypted url}.
+
+    With the C DES backend, every URL that isn't memoized yet is decrypted
+    in a single call (ECB blocks are independent) and then split apart.
+    """
+    results = {}
+    pending = []
+    for url in dict.fromkeys(url for url in urls if url):
+        dec_url = _memo_get(url)
+        if dec_url is not None:
+            results[url] = dec_url
+        else:
+            pending.append(url)
+    
+    if _DES is not None and len(pending) > 1:
+        start = time.perf_counter()
+        blobs = []
+        for url in pending:
+            try:
+                blob = base64.b64decode(url.strip())
+            except Exception:
+                continue
+            if blob and len(blob) % 8 == 0:
+                blobs.append((url, blob))
+        plain = _des_decrypt_blocks(b"".join(blob for _, blob in blobs))
+        offset = 0
+        for url, blob in blobs:
+            chunk = plain[offset:offset + len(blob)]
+            offset += len(blob)
+            try:
+                results[url] = _finish_url(chunk[:-chunk[-1]])
+                _memo_set(url, results[url])
+            except Exception:
+                pass
+        metrics.record("decrypt", time.perf_counter() - start)
+    
+    for url in pending:
+        if url not in results:
+            results[url] = decrypt_url(url)
+    return results
+
+def needs_decrypted_url(data):
+    """Whether format_song_clean will have to decrypt this song's media URL"""
+    media_url = data.get('media_url') or data.get('media_preview_url', '')
+    return bool(data.get('encrypted_media_url')) and (not media_url or 'preview' in media_url)
+
+def decrypt_song_urls(songs):
+    """Batch-decrypt, into the memo, the media URLs a page of songs will need"""
+    decrypt_urls([song['encrypted_media_url'] for song in songs if song and needs_decrypted_url(song)])
+
 # WEB SCRAPING FUNCTIONS
 def scrape_jiosaavn_search(query):
     """Scrape search results directly from JioSaavn website"""
-    url = f"https://www.jiosaavn.com/search/{query}"
+    url = endpoints.search_page_base_url + query
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'DNT': '1',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-        'Sec-Fetch-Dest': 'document',
-        'Sec-Fetch-Mode': 'navigate',
-        'Sec-Fetch-Site': 'none',
-        'Cache-Control': 'max-age=0',
-    }
+    # Don't keep scraping while the site is blocking us
+    if upstream.health.is_open("scrape"):
+        return []
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = upstream.get(url, headers=upstream.HTML_HEADERS)
         response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Method 1: Look for JSON data in script tags
-        scripts = soup.find_all('script')
-        for script in scripts:
-            if script.string:
-                content = script.string
-                # Look for initial data
-                if '__INITIAL_DATA__' in content:
-                    json_match = re.search(r'__INITIAL_DATA__\s*=\s*({.*?});', content)
-                    if json_match:
-                        try:
-                            data = json.loads(json_match.group(1))
-                            songs = extract_songs_from_initial_data(data)
-                            if songs:
-                                return songs
-                        except json.JSONDecodeError:
-                            continue
-        
-        # Method 2: Extract from HTML elements
-        songs = extract_songs_from_html(soup)
-        if songs:
-            return songs
-            
-        return []
+        return extract_songs_from_page(response.content)
         
     except Exception as e:
         print(f"Scraping error: {e}")
         return []
 
+@metrics.timed_function("scrape_parse")
+def extract_songs_from_page(content):
+    """Extract songs from a search page's raw bytes"""
+    # Method 1: Read the __INITIAL_DATA__ JSON straight from the bytes
+    data = extract_initial_data(content)
+    if data:
+        songs = extract_songs_from_initial_data(data)
+        if songs:
+            return songs
+    
+    # Method 2: Parse the DOM (lxml backend) and extract from HTML elements
+    soup = BeautifulSoup(content, 'lxml')
+    return extract_songs_from_html(soup)
+
+_INITIAL_DATA_MARKER = b'__INITIAL_DATA__'
+_JSON_DECODER = json.JSONDecoder()
+_STRING_END = re.compile(rb'(?:[^"\\]|\\.)*"', re.S)
+_BRACE_OR_QUOTE = re.compile(rb'[{}"]')
+_JS_UNDEFINED = re.compile(r'(?<=[:\[,])\s*undefined(?=\s*[,}\]])')
+
+def extract_initial_data(content):
+    """Decode the `__INITIAL_DATA__ = {...}` payload without building a DOM"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    
+    start = content.find(_INITIAL_DATA_MARKER)
+    while start != -1:
+        brace = content.find(b'{', start + len(_INITIAL_DATA_MARKER))
+        if brace != -1 and content[start + len(_INITIAL_DATA_MARKER):brace].strip() == b'=':
+            data = _decode_object_at(content, brace)
+            if isinstance(data, dict):
+                return data
+        start = content.find(_INITIAL_DATA_MARKER, start + 1)
+    
+    return None
+
+def _decode_object_at(content, brace):
+    """Decode the JS object literal starting at content[brace]"""
+    # Fast path: the C JSON decoder stops at the end of the first object
+    try:
+        return _JSON_DECODER.raw_decode(content[brace:].decode('utf-8', 'replace'))[0]
+    except ValueError:
+        pass
+    # Not strict JSON (JS allows undefined where JSON needs null): cut the
+    # object out by matching braces, then patch it up
+    end = _match_brace(content, brace)
+    if end is None:
+        return None
+    text = content[brace:end].decode('utf-8', 'replace')
+    try:
+        return json.loads(_JS_UNDEFINED.sub('null', text))
+    except ValueError:
+        return None
+
+def _match_brace(content, brace):
+    """Index just past the brace matching content[brace], skipping strings"""
+    depth = 0
+    pos = brace
+    while True:
+        match = _BRACE_OR_QUOTE.search(content, pos)
+        if not match:
+            return None
+        char = match.group()
+        if char == b'"':
+            string_end = _STRING_END.match(content, match.end())
+            if not string_end:
+                return None
+            pos = string_end.end()
+            continue
+        depth += 1 if char == b'{' else -1
+        pos = match.end()
+        if depth == 0:
+            return pos
+
 def extract_songs_from_initial_data(data):
     """Extract songs from the initial data JSON"""
     songs = []
@@ -217,12 +464,11 @@ def extract_songs_from_html(soup):
             '.track-list'
         ]
         
-        for selector in song_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                song = parse_song_from_element(element)
-                if song:
-                    songs.append(song)
+        # One pass over the document for all selectors
+        for element in soup.select(', '.join(song_selectors)):
+            song = parse_song_from_element(element)
+            if song:
+                songs.append(song)
                 
     except Exception as e:
         print(f"Error extracting from HTML: {e}")
@@ -299,20 +545,26 @@ def parse_song_from_element(element):
     
     return None
 
-def remove_duplicate_songs(songs):
-    """Remove duplicate songs based on ID and title"""
-    seen = set()
+def song_identifier(song):
+    """Key used to spot the same song coming from different sources"""
+    song_id = song.get('id', '')
+    song_title = song.get('song', '').lower().strip()
+    return f"{song_id}_{song_title}" if song_id else song_title
+
+def remove_duplicate_songs(songs, seen=None):
+    """Remove duplicate songs based on ID and title.
+
+    Pass the same `seen` set across calls to dedup incrementally.
+    """
+    if seen is None:
+        seen = set()
     unique_songs = []
     
     for song in songs:
         if not song:
             continue
             
-        # Create a unique identifier
-        song_id = song.get('id', '')
-        song_title = song.get('song', '').lower().strip()
-        
-        identifier = f"{song_id}_{song_title}" if song_id else song_title
+        identifier = song_identifier(song)
         
         if identifier and identifier not in seen:
             seen.add(identifier)
@@ -320,17 +572,50 @@ def remove_duplicate_songs(songs):
     
     return unique_songs
 
+def format_songs_page(songs, page=1, limit=50):
+    """Format only the songs on one page of a raw track list"""
+    offset = (page - 1) * limit
+    page_songs = songs[offset:offset + limit]
+    decrypt_song_urls(page_songs)
+    return [clean_song for clean_song in map(format_song_clean, page_songs) if clean_song]
+
+def format_album_clean(data, page=1, limit=50):
+    """Clean-format album with one page of its tracks"""
+    songs = data.get('songs') or []
+    return {
+        "id": data.get('albumid') or data.get('id', ''),
+        "name": format(data.get('title') or data.get('name', '')),
+        "primary_artists": format(data.get('primary_artists', '')),
+        "year": data.get('year', ''),
+        "release_date": data.get('release_date', ''),
+        "image": data.get('image', '').replace("150x150", "500x500"),
+        "perma_url": data.get('perma_url', ''),
+        "song_count": len(songs),
+        "songs": format_songs_page(songs, page, limit)
+    }
+
+def format_playlist_clean(data, page=1, limit=50):
+    """Clean-format playlist with one page of its tracks"""
+    songs = data.get('songs') or []
+    return {
+        "id": data.get('listid') or data.get('id', ''),
+        "name": format(data.get('listname', '')),
+        "owner": format(data.get('firstname', '')),
+        "follower_count": safe_int(data.get('follower_count', 0)),
+        "image": data.get('image', '').replace("150x150", "500x500"),
+        "perma_url": data.get('perma_url', ''),
+        "song_count": len(songs),
+        "songs": format_songs_page(songs, page, limit)
+    }
+
 # LEGACY FUNCTIONS FOR BACKWARD COMPATIBILITY
 def format_song(data, lyrics):
     """Legacy function for backward compatibility"""
     clean_data = format_song_clean(data)
     if clean_data and lyrics and clean_data.get('lyrics_id'):
-        # You'll need to import jiosaavn here or handle lyrics differently
-        try:
-            import jiosaavn
-            clean_data['lyrics'] = jiosaavn.get_lyrics(clean_data['lyrics_id'])
-        except:
-            pass
+        # Imported here since the lyrics module imports this one
+        from lyrics import get_lyrics
+        clean_data['lyrics'] = get_lyrics(clean_data['lyrics_id'])
     return clean_data
 
 def format_album(data, lyrics):
@@ -344,8 +629,7 @@ def format_album(data, lyrics):
     data['title'] = format(data.get('title', ''))
     
     if 'songs' in data:
-        for song in data['songs']:
-            song = format_song(song, lyrics)
+        data['songs'] = [format_song(song, lyrics) for song in data['songs']]
     
     return data
 
@@ -358,7 +642,6 @@ def format_playlist(data, lyrics):
     data['listname'] = format(data.get('listname', ''))
     
     if 'songs' in data:
-        for song in data['songs']:
-            song = format_song(song, lyrics)
+        data['songs'] = [format_song(song, lyrics) for song in data['songs']]
     
     return data
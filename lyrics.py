@@ -0,0 +1,44 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import endpoints
+import helper
+import upstream
+import metrics
+from cache import cache_response
+
+# Lyrics never change once published, so they're cached for a long time
+LYRICS_TTL = int(os.environ.get("LYRICS_TTL", 7 * 24 * 3600))
+LYRICS_MAX_WORKERS = int(os.environ.get("LYRICS_MAX_WORKERS", 8))
+
+# Bounds concurrent lyrics calls per worker, however many pages request them
+_lyrics_executor = ThreadPoolExecutor(max_workers=LYRICS_MAX_WORKERS, thread_name_prefix="lyrics")
+
+
+@cache_response(ttl=LYRICS_TTL, stale_ttl=LYRICS_TTL)
+def get_lyrics(lyrics_id):
+    """Get the lyrics text for a lyrics_id"""
+    try:
+        response = upstream.get(endpoints.lyrics_base_url + lyrics_id)
+        return helper.decode_api_body(response.content).get('lyrics')
+    except Exception as e:
+        print(f"Error fetching lyrics {lyrics_id}: {str(e)}")
+        return None
+
+def get_lyrics_batch(lyrics_ids):
+    """Fetch lyrics for many ids concurrently; returns {lyrics_id: lyrics}"""
+    unique_ids = list(dict.fromkeys(lyrics_id for lyrics_id in lyrics_ids if lyrics_id))
+    if len(unique_ids) <= 1:
+        return {lyrics_id: get_lyrics(lyrics_id) for lyrics_id in unique_ids}
+    futures = [metrics.submit(_lyrics_executor, get_lyrics, lyrics_id) for lyrics_id in unique_ids]
+    return {lyrics_id: future.result() for lyrics_id, future in zip(unique_ids, futures)}
+
+def attach_lyrics(songs):
+    """Return the songs with a 'lyrics' field on those that have lyrics.
+
+    Songs are copied rather than modified, since they may be cached objects.
+    """
+    found = get_lyrics_batch([song.get('lyrics_id') for song in songs])
+    return [
+        dict(song, lyrics=found[song['lyrics_id']]) if song.get('lyrics_id') else song
+        for song in songs
+    ]
@@ -0,0 +1,240 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar, copy_context
+from functools import wraps
+
+# Hot-path timings. Each request gets a collector (in a ContextVar, so
+# executor work submitted through `submit` reports back to it) that becomes
+# its Server-Timing header; the same timings feed process-wide histograms
+# served in Prometheus text format on /metrics. METRICS_ENABLED=false turns
+# all of it off: counters and histograms stop recording and no
+# Server-Timing header is sent.
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() != "false"
+
+# Seconds; covers a memoized decrypt up to a slow upstream call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labelvalues, value in sorted(values.items()):
+            yield self.name, _labels(self.labelnames, labelvalues), value
+
+
+class Gauge(Counter):
+    """Point-in-time value per label set"""
+
+    kind = "gauge"
+
+    def set(self, value, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}  # labelvalues -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labelvalues):
+        if not METRICS_ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                entry = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {labelvalues: list(entry) for labelvalues, entry in self._values.items()}
+        for labelvalues, entry in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                yield self.name + "_bucket", _labels(self.labelnames + ("le",), labelvalues + (repr(bound),)), cumulative
+            yield self.name + "_bucket", _labels(self.labelnames + ("le",), labelvalues + ("+Inf",)), entry[-1]
+            yield self.name + "_sum", _labels(self.labelnames, labelvalues), round(entry[-2], 6)
+            yield self.name + "_count", _labels(self.labelnames, labelvalues), entry[-1]
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = (f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+stage_seconds = Histogram("jiosaavn_stage_seconds", "Time spent in each hot-path stage", ("stage",))
+upstream_seconds = Histogram("jiosaavn_upstream_request_seconds", "Upstream request latency by endpoint", ("endpoint",))
+upstream_requests = Counter("jiosaavn_upstream_requests_total", "Upstream requests by endpoint and status", ("endpoint", "status"))
+cache_lookups = Counter("jiosaavn_cache_lookups_total", "Cached function lookups by result", ("function", "result"))
+http_seconds = Histogram("jiosaavn_http_request_seconds", "Request latency by route", ("route", "status"))
+
+
+class RequestTimings:
+    """Per-request stage totals, for the Server-Timing header"""
+
+    __slots__ = ("started", "stages", "lock")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}  # stage -> [seconds, count]
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                self.stages[stage] = [seconds, 1]
+            else:
+                entry[0] += seconds
+                entry[1] += 1
+
+    def header(self, total=None):
+        """Server-Timing value: each stage's total ms, with a call count when >1"""
+        with self.lock:
+            stages = sorted(self.stages.items(), key=lambda item: -item[1][0])
+        parts = []
+        for stage, (seconds, count) in stages:
+            part = f"{stage};dur={seconds * 1000:.1f}"
+            if count > 1:
+                part += f';desc="{count}x"'
+            parts.append(part)
+        if total is not None:
+            parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_request_timings = ContextVar("request_timings", default=None)
+
+
+def start_request():
+    """Give the current request (context) a fresh timing collector"""
+    timings = RequestTimings()
+    _request_timings.set(timings)
+    return timings
+
+
+def current_request():
+    return _request_timings.get()
+
+
+def add_timing(stage, seconds):
+    """Count time towards the current request's Server-Timing only"""
+    if not METRICS_ENABLED:
+        return
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+def record(stage, seconds):
+    """Count time spent in a stage, for this request and the histograms"""
+    if not METRICS_ENABLED:
+        return
+    stage_seconds.observe(seconds, stage)
+    add_timing(stage, seconds)
+
+
+class timed:
+    """Context manager timing a block as `stage`"""
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def timed_function(stage):
+    """Decorator timing every call of a function as `stage`"""
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def submit(executor, fn, *args, **kwargs):
+    """executor.submit, running fn in a copy of the caller's context so its
+    timings count towards the caller's request"""
+    return executor.submit(copy_context().run, fn, *args, **kwargs)
+
+
+def render(extra=()):
+    """All metrics in Prometheus text format.
+
+    `extra` is (name, type, help, value) tuples for point-in-time values
+    computed by the caller, e.g. cache sizes.
+    """
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {value}")
+    for name, kind, help, value in extra:
+        if value is None:
+            continue
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -1,16 +1,163 @@
-from flask import jsonify
+from flask import jsonify, request, Response, stream_with_context
+from collections import OrderedDict
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
 import time
 
-def success_response(data, message="Success", meta=None):
-    response = {
-        "status": "success",
-        "message": message,
-        "data": data,
-        "timestamp": int(time.time())
-    }
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Serialized bodies of recent success responses. Cached results come back as
+# the same object on every hit, so their JSON, its compressed variants and
+# ETag are built once and reused until RESPONSE_BODY_TTL passes (the body's
+# timestamp is from when it was built).
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 2000))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+RESPONSE_BODY_TTL = float(os.environ.get("RESPONSE_BODY_TTL", 60))
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+
+_bodies = OrderedDict()  # (id(data), message, meta json) -> _Body
+_bodies_lock = threading.Lock()
+_body_stats = {"hits": 0, "misses": 0, "not_modified": 0, "bytes": 0}
+
+
+class _Body:
+    __slots__ = ("key", "data", "built", "body", "etag", "encoded", "size")
+
+    def __init__(self, key, data, body, etag):
+        self.key = key
+        self.data = data  # keeps id(data) from being reused while cached
+        self.built = time.time()
+        self.body = body
+        self.etag = etag
+        self.encoded = {}
+        self.size = len(body)
+
+    def encode(self, encoding):
+        """The body compressed with `encoding`, compressed on first use"""
+        encoded = self.encoded.get(encoding)
+        if encoded is None:
+            if encoding == "br":
+                encoded = brotli.compress(self.body, quality=6)
+            else:
+                encoded = gzip.compress(self.body, compresslevel=6)
+            self.encoded[encoding] = encoded
+            with _bodies_lock:
+                self.size += len(encoded)
+                # Only count it if this body is still cached (it may have
+                # been evicted or cleared since it was handed out)
+                if _bodies.get(self.key) is self:
+                    _body_stats["bytes"] += len(encoded)
+        return encoded
+
+
+def _dumps(obj):
+    # Same output as jsonify outside debug mode
+    return json.dumps(obj, separators=(',', ':'), sort_keys=True)
+
+def _build_body(key, data, message, meta):
+    payload = {"status": "success", "message": message, "data": data}
     if meta:
-        response["meta"] = meta
-    return jsonify(response)
+        payload["meta"] = meta
+    serialized = _dumps(payload)
+    # The timestamp isn't part of the ETag, so an unchanged result revalidates
+    etag = hashlib.blake2b(serialized.encode('utf-8'), digest_size=12).hexdigest()
+    body = f'{serialized[:-1]},"timestamp":{int(time.time())}}}\n'.encode('utf-8')
+    return _Body(key, data, body, etag)
+
+def _cached_body(data, message, meta):
+    meta_json = _dumps(meta) if meta else ""
+    key = (id(data), message, meta_json)
+    now = time.time()
+    with _bodies_lock:
+        entry = _bodies.get(key)
+        if entry is not None and entry.data is data and now - entry.built < RESPONSE_BODY_TTL:
+            _bodies.move_to_end(key)
+            _body_stats["hits"] += 1
+            return entry
+        _body_stats["misses"] += 1
+    
+    entry = _build_body(key, data, message, meta)
+    with _bodies_lock:
+        old = _bodies.pop(key, None)
+        if old is not None:
+            _body_stats["bytes"] -= old.size
+        _bodies[key] = entry
+        _body_stats["bytes"] += entry.size
+        while _bodies and (len(_bodies) > RESPONSE_CACHE_MAX_ENTRIES or _body_stats["bytes"] > RESPONSE_CACHE_MAX_BYTES):
+            _body_stats["bytes"] -= _bodies.popitem(last=False)[1].size
+    return entry
+
+def _negotiate_encoding(body_size):
+    if body_size < COMPRESS_MIN_BYTES:
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+def response_cache_stats():
+    with _bodies_lock:
+        return dict(_body_stats, entries=len(_bodies), max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+                    brotli=brotli is not None)
+
+def clear_response_cache():
+    with _bodies_lock:
+        _bodies.clear()
+        _body_stats["bytes"] = 0
+
+def success_response(data, message="Success", meta=None, max_age=0):
+    """JSON success envelope, with an ETag, a 304 for a matching
+    If-None-Match, and gzip/brotli when the client accepts it.
+
+    `max_age` sets how long clients and CDNs may reuse the response without
+    revalidating; 0 means revalidate every time.
+    """
+    entry = _cached_body(data, message, meta)
+    
+    if request.if_none_match.contains_weak(entry.etag):
+        with _bodies_lock:
+            _body_stats["not_modified"] += 1
+        response = Response(status=304)
+    else:
+        encoding = _negotiate_encoding(len(entry.body))
+        response = Response(entry.encode(encoding) if encoding else entry.body, mimetype="application/json")
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    
+    response.set_etag(entry.etag, weak=True)
+    response.headers["Cache-Control"] = f"public, max-age={max_age}" if max_age else "no-cache"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+STREAM_MIMETYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def stream_response(events, stream_format="ndjson"):
+    """Stream (event, data) pairs as NDJSON lines or Server-Sent Events"""
+    def generate():
+        try:
+            for event, data in events:
+                yield stream_chunk(event, data, stream_format)
+        except Exception as e:
+            yield stream_chunk("error", {"message": "Stream failed", "details": str(e)}, stream_format)
+    
+    response = Response(stream_with_context(generate()), mimetype=STREAM_MIMETYPES[stream_format])
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # don't let proxies hold chunks back
+    return response
+
+def stream_chunk(event, data, stream_format="ndjson"):
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+    return json.dumps({"type": event, "data": data}, separators=(',', ':')) + "\n"
 
 def error_response(message, error_code=400, details=None):
     response = {
@@ -23,11 +170,31 @@ def error_response(message, error_code=400, details=None):
         response["details"] = details
     return jsonify(response), error_code
 
-def pagination_meta(page, limit, total):
-    return {
+def pagination_meta(page, limit, total, cursor_state=None):
+    meta = {
         "page": page,
         "limit": limit,
         "total": total,
-        "has_next": (page * limit) < total,
+        "has_next": limit > 0 and (page * limit) < total,
         "has_prev": page > 1
     }
+    # Cursors carry the rest of the request so clients can just follow them
+    if cursor_state is not None:
+        meta["next_cursor"] = encode_cursor(dict(cursor_state, p=page + 1)) if meta["has_next"] else None
+        meta["prev_cursor"] = encode_cursor(dict(cursor_state, p=page - 1)) if meta["has_prev"] else None
+    return meta
+
+def encode_cursor(state):
+    """Opaque, URL-safe pagination cursor for a dict of request state"""
+    raw = json.dumps(state, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Request state from a cursor; raises ValueError if it's malformed"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(state, dict):
+        raise ValueError("Invalid cursor")
+    return state
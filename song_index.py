@@ -0,0 +1,210 @@
+import os
+import re
+import json
+import atexit
+import bisect
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+import song_store
+
+# Local index of songs this worker has already formatted, so autocomplete and
+# repeat searches can be answered without going upstream. Songs are held as
+# the song_store records the cache uses, not copies of their own.
+
+SONG_INDEX_MAX_SONGS = int(os.environ.get("SONG_INDEX_MAX_SONGS", 20000))
+SONG_INDEX_PATH = os.environ.get("SONG_INDEX_PATH", os.path.join(tempfile.gettempdir(), "jiosaavn-song-index.json"))
+SONG_INDEX_MIN_CONFIDENCE = float(os.environ.get("SONG_INDEX_MIN_CONFIDENCE", 0.9))
+
+# How much a query token matching each field counts towards a song's score
+FIELD_WEIGHTS = (3.0, 2.0, 1.0)  # title, artists, album
+# How good each kind of token match is
+EXACT, PREFIX, TYPO = 1.0, 0.9, 0.6
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_MIN_TYPO_LENGTH = 4
+
+
+def normalize(text):
+    """Casefold and strip accents, then split into word tokens"""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _TOKEN_PATTERN.findall(text.casefold())
+
+
+def _deletes(token):
+    """Every variant of token with one character removed"""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+class SongIndex:
+    """Inverted index over title, artist and album tokens.
+
+    The last query token matches as a prefix (autocomplete); tokens of four
+    or more characters also match words one edit away. Holds at most
+    `max_songs` songs, dropping the least recently seen first.
+    """
+
+    def __init__(self, max_songs=SONG_INDEX_MAX_SONGS):
+        self.max_songs = max_songs
+        self._songs = OrderedDict()   # id -> song_store.SongRecord
+        self._fields = {}             # id -> (title tokens, artist tokens, album tokens)
+        self._postings = {}           # token -> set of ids
+        self._sorted_tokens = []      # all tokens, for prefix scans
+        self._typo_variants = {}      # token or one-deletion variant -> set of tokens
+        self._lock = threading.RLock()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._songs)
+
+    def add(self, song):
+        """Index a clean-format song (re-adding just refreshes its recency)"""
+        song_id = song.get('id') if song else None
+        if not song_id or not song.get('song'):
+            return
+        record = song_store.store.add(song)
+        fields = (
+            frozenset(normalize(song['song'])),
+            frozenset(token for artist in song.get('artists') or [] for token in normalize(artist)),
+            frozenset(normalize(song.get('album'))),
+        )
+        with self._lock:
+            if song_id in self._songs:
+                if self._fields[song_id] == fields:
+                    self._songs.move_to_end(song_id)
+                    self._songs[song_id] = record
+                    return
+                self._remove(song_id)
+            self._songs[song_id] = record
+            self._fields[song_id] = fields
+            for token in fields[0] | fields[1] | fields[2]:
+                self._add_posting(token, song_id)
+            while len(self._songs) > self.max_songs:
+                self._remove(next(iter(self._songs)))
+                self.evictions += 1
+
+    def search(self, query, limit=10):
+        """Return (songs, confidence) best first; confidence is 0..1"""
+        tokens = normalize(query)
+        if not tokens:
+            return [], 0.0
+        with self._lock:
+            scores = None
+            confidence = EXACT
+            for position, token in enumerate(tokens):
+                matches = self._match(token, prefix=position == len(tokens) - 1)
+                if not matches:
+                    return [], 0.0
+                confidence = min(confidence, max(matches.values()))
+                token_scores = {}
+                for term, quality in matches.items():
+                    for song_id in self._postings[term]:
+                        fields = self._fields[song_id]
+                        weight = max(w for w, field in zip(FIELD_WEIGHTS, fields) if term in field)
+                        score = weight * quality
+                        if score > token_scores.get(song_id, 0):
+                            token_scores[song_id] = score
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {song_id: score + token_scores[song_id]
+                              for song_id, score in scores.items() if song_id in token_scores}
+                if not scores:
+                    return [], 0.0
+            ranked = sorted(scores, key=lambda song_id: (-scores[song_id], -(self._songs[song_id].play_count or 0)))
+            return [self._songs[song_id].to_dict() for song_id in ranked[:limit]], confidence
+
+    def stats(self):
+        with self._lock:
+            return {
+                "songs": len(self._songs),
+                "tokens": len(self._postings),
+                "max_songs": self.max_songs,
+                "evictions": self.evictions,
+            }
+
+    def snapshot(self, path=SONG_INDEX_PATH):
+        """Write the indexed songs to disk (atomically), oldest first"""
+        with self._lock:
+            songs = [record.to_dict() for record in self._songs.values()]
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(songs, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        return len(songs)
+
+    def restore(self, path=SONG_INDEX_PATH):
+        """Load songs from a snapshot; returns how many were read"""
+        with open(path, encoding="utf-8") as f:
+            songs = json.load(f)
+        for song in songs:
+            self.add(song)
+        return len(songs)
+
+    def _match(self, token, prefix):
+        """Index tokens matching a query token -> match quality"""
+        matches = {}
+        if prefix:
+            position = bisect.bisect_left(self._sorted_tokens, token)
+            while position < len(self._sorted_tokens) and self._sorted_tokens[position].startswith(token):
+                matches[self._sorted_tokens[position]] = PREFIX
+                position += 1
+        if len(token) >= _MIN_TYPO_LENGTH:
+            for variant in _deletes(token) | {token}:
+                for term in self._typo_variants.get(variant, ()):
+                    matches.setdefault(term, TYPO)
+        if token in self._postings:
+            matches[token] = EXACT
+        return matches
+
+    def _add_posting(self, token, song_id):
+        ids = self._postings.get(token)
+        if ids is None:
+            ids = self._postings[token] = set()
+            bisect.insort(self._sorted_tokens, token)
+            if len(token) >= _MIN_TYPO_LENGTH:
+                for variant in _deletes(token) | {token}:
+                    self._typo_variants.setdefault(variant, set()).add(token)
+        ids.add(song_id)
+
+    def _remove(self, song_id):
+        del self._songs[song_id]
+        fields = self._fields.pop(song_id)
+        for token in fields[0] | fields[1] | fields[2]:
+            ids = self._postings[token]
+            ids.discard(song_id)
+            if ids:
+                continue
+            del self._postings[token]
+            del self._sorted_tokens[bisect.bisect_left(self._sorted_tokens, token)]
+            if len(token) >= _MIN_TYPO_LENGTH:
+                for variant in _deletes(token) | {token}:
+                    terms = self._typo_variants[variant]
+                    terms.discard(token)
+                    if not terms:
+                        del self._typo_variants[variant]
+
+
+# Shared index for this worker, restored from the last snapshot if there is one
+index = SongIndex()
+
+def _restore():
+    if SONG_INDEX_PATH and os.path.exists(SONG_INDEX_PATH):
+        try:
+            index.restore()
+        except Exception as e:
+            print(f"Could not restore song index from {SONG_INDEX_PATH}: {e}")
+
+def _snapshot():
+    if SONG_INDEX_PATH and len(index):
+        try:
+            index.snapshot()
+        except Exception as e:
+            print(f"Could not snapshot song index to {SONG_INDEX_PATH}: {e}")
+
+_restore()
+atexit.register(_snapshot)
@@ -0,0 +1,231 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# Normalized song storage for the in-process cache. Each song is held once,
+# by id, as a compact record with its repeated strings (artists, album,
+# language, ...) interned; cached search pages and song lookups keep only
+# ids and are expanded back to clean dicts when served. A fresher copy of a
+# song updates its record, and with it every cached entry that refers to it.
+
+SONG_STORE_MAX_SONGS = int(os.environ.get("SONG_STORE_MAX_SONGS", 50000))
+SONG_STORE_MEMO_SIZE = int(os.environ.get("SONG_STORE_MEMO_SIZE", 512))
+
+# Clean-format fields, in the order format_song_clean emits them
+FIELDS = ("id", "song", "artists", "album", "year", "language", "duration_sec", "play_count",
+          "image", "media_url", "perma_url", "copyright", "lyrics_id")
+_INTERNED = ("album", "year", "language", "copyright")
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def is_complete(song):
+    """Whether a clean song has every field (not a fields= projection)"""
+    return isinstance(song, dict) and all(name in song for name in FIELDS)
+
+
+class SongRecord:
+    __slots__ = FIELDS + ("version",)
+
+    def __init__(self, song):
+        for name in FIELDS:
+            setattr(self, name, song.get(name))
+        self.artists = tuple(_intern(artist) for artist in self.artists or ())
+        for name in _INTERNED:
+            setattr(self, name, _intern(getattr(self, name)))
+        self.version = 0
+
+    def update(self, song):
+        """Take every non-empty field from a fresher copy; True if anything changed"""
+        changed = False
+        for name in FIELDS:
+            value = song.get(name)
+            if not value:
+                continue
+            if name == "artists":
+                value = tuple(_intern(artist) for artist in value)
+            elif name in _INTERNED:
+                value = _intern(value)
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                changed = True
+        if changed:
+            self.version += 1
+        return changed
+
+    def to_dict(self):
+        song = {name: getattr(self, name) for name in FIELDS}
+        song["artists"] = list(self.artists)
+        return song
+
+
+class SongStore:
+    """Bounded id -> SongRecord map, least recently used dropped first"""
+
+    def __init__(self, max_songs=SONG_STORE_MAX_SONGS):
+        self.max_songs = max_songs
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+        self.updates = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def merge(self, song):
+        """Store a freshly formatted song, updating its record if there is one"""
+        return self._put(song, replace=True)
+
+    def add(self, song):
+        """Store a song unless its id is already known (e.g. restored from L2)"""
+        return self._put(song, replace=False)
+
+    def get(self, song_id):
+        with self._lock:
+            record = self._records.get(song_id)
+            if record is not None:
+                self._records.move_to_end(song_id)
+            return record
+
+    def records(self, song_ids):
+        """Records for the ids, or None if any has been evicted"""
+        with self._lock:
+            records = []
+            for song_id in song_ids:
+                record = self._records.get(song_id)
+                if record is None:
+                    return None
+                self._records.move_to_end(song_id)
+                records.append(record)
+            return records
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "songs": len(self._records),
+                "max_songs": self.max_songs,
+                "updates": self.updates,
+                "evictions": self.evictions,
+            }
+
+    def _put(self, song, replace):
+        song_id = song.get("id") if song else None
+        if not song_id:
+            return None
+        with self._lock:
+            record = self._records.get(song_id)
+            if record is None:
+                record = self._records[song_id] = SongRecord(song)
+                while len(self._records) > self.max_songs:
+                    self._records.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._records.move_to_end(song_id)
+                if replace and record.update(song):
+                    self.updates += 1
+            return record
+
+
+store = SongStore()
+
+
+class _Memo:
+    """Recently expanded values, so hot cache hits keep returning the same
+    object until one of their songs changes (see response_helper)"""
+
+    def __init__(self, size=SONG_STORE_MEMO_SIZE):
+        self.size = size
+        self._values = OrderedDict()  # id(packed) -> (packed, versions, value)
+        self._lock = threading.Lock()
+
+    def get(self, packed, versions):
+        with self._lock:
+            entry = self._values.get(id(packed))
+            if entry is not None and entry[0] is packed and entry[1] == versions:
+                self._values.move_to_end(id(packed))
+                return entry[2]
+        return None
+
+    def set(self, packed, versions, value):
+        with self._lock:
+            self._values[id(packed)] = (packed, versions, value)
+            self._values.move_to_end(id(packed))
+            if len(self._values) > self.size:
+                self._values.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class SongCodec:
+    """cache_response codec keeping a clean song as its id in the L1 cache.
+
+    Fields outside the clean format (e.g. attached lyrics) are kept with
+    the id. Anything without an id, or missing clean fields, is cached as-is.
+    """
+
+    def __init__(self):
+        self.memo = _Memo()
+
+    def pack(self, song):
+        if not is_complete(song) or store.add(song) is None:
+            return song
+        extras = {name: value for name, value in song.items() if name not in FIELDS}
+        return (song["id"], extras)
+
+    def unpack(self, packed):
+        if not isinstance(packed, tuple):
+            return packed
+        record = store.get(packed[0])
+        if record is None:
+            return None
+        versions = record.version
+        song = self.memo.get(packed, versions)
+        if song is None:
+            song = record.to_dict()
+            song.update(packed[1])
+            self.memo.set(packed, versions, song)
+        return song
+
+
+class SongPageCodec:
+    """cache_response codec for {"results": [clean songs], ...} values,
+    keeping only the song ids in the L1 cache (pages of partial songs are
+    cached as-is)"""
+
+    def __init__(self):
+        self.memo = _Memo()
+
+    def pack(self, page):
+        songs = page.get("results") if isinstance(page, dict) else None
+        if songs is None or not all(is_complete(song) for song in songs):
+            return page
+        if not all(store.add(song) is not None for song in songs):
+            return page
+        rest = {name: value for name, value in page.items() if name != "results"}
+        return (tuple(song["id"] for song in songs), rest)
+
+    def unpack(self, packed):
+        if not isinstance(packed, tuple):
+            return packed
+        records = store.records(packed[0])
+        if records is None:
+            return None
+        versions = tuple(record.version for record in records)
+        page = self.memo.get(packed, versions)
+        if page is None:
+            page = dict(packed[1], results=[record.to_dict() for record in records])
+            self.memo.set(packed, versions, page)
+        return page
+
+
+song_codec = SongCodec()
+song_page_codec = SongPageCodec()
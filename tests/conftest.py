@@ -0,0 +1,37 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from stub_server import start_stub_server
+
+# The app reads its configuration at import time: keep every test run local
+# (recorded upstream responses, in-memory cache, nothing read from or
+# written to disk) before anything imports it.
+stub_server, stub_url = start_stub_server(latency_ms=0, jitter_ms=0)
+os.environ["JIOSAAVN_BASE_URL"] = stub_url
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["SONG_INDEX_PATH"] = ""
+os.environ["CACHE_WARM_ENABLED"] = "false"
+os.environ["CACHE_WARM_PATH"] = ""
+
+import pytest
+
+
+@pytest.fixture
+def stub():
+    stub_server.state.reset()
+    return stub_server.state
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    import cache
+    import song_store
+    cache.cache_store.clear()
+    song_store.store.clear()
+    song_store.song_codec.memo.clear()
+    song_store.song_page_codec.memo.clear()
+    yield
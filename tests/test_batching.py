@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+
+from batching import MicroBatcher
+
+
+def test_lookups_in_one_window_share_a_call():
+    calls = []
+
+    def fetch_many(keys):
+        calls.append(sorted(keys))
+        return {key: key.upper() for key in keys if key != "missing"}
+
+    batcher = MicroBatcher(fetch_many, window=0.05)
+    futures = [batcher.submit(key) for key in ["a", "b", "a", "missing"]]
+    assert [future.result(5) for future in futures] == ["A", "B", "A", None]
+    assert calls == [["a", "b", "missing"]]
+    assert batcher.stats() == {"lookups": 4, "batches": 1, "keys_fetched": 3}
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    done = threading.Event()
+
+    def fetch_many(keys):
+        done.set()
+        return {key: key for key in keys}
+
+    batcher = MicroBatcher(fetch_many, window=60, max_batch=2)
+    first = batcher.submit("a")
+    assert batcher.get("b", timeout=5) == "b"
+    assert first.result(0) == "a" and done.is_set()
+
+
+def test_fetch_error_reaches_every_waiter():
+    def fetch_many(keys):
+        raise RuntimeError("upstream down")
+
+    batcher = MicroBatcher(fetch_many, window=0.01)
+    futures = [batcher.submit(key) for key in "ab"]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(5)
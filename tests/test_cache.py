@@ -0,0 +1,111 @@
+import threading
+import time
+
+import cache
+from cache import LRUCache, cache_response
+
+
+class FakeClock:
+    def __init__(self, monkeypatch):
+        self.now = 1000.0
+        # Patches time.time everywhere, so tests measure real time with monotonic()
+        monkeypatch.setattr(cache.time, "time", lambda: self.now)
+
+
+def test_lru_evicts_least_recently_used_entry(monkeypatch):
+    FakeClock(monkeypatch)
+    store = LRUCache(max_entries=2)
+    store.set("a", 1, ttl=60)
+    store.set("b", 2, ttl=60)
+    assert store.get("a") == 1  # "b" is now the least recently used
+    store.set("c", 3, ttl=60)
+    assert store.get("b") is None
+    assert store.get("a") == 1 and store.get("c") == 3
+    assert store.stats()["evictions"] == 1
+
+
+def test_lru_evicts_to_stay_under_max_bytes(monkeypatch):
+    FakeClock(monkeypatch)
+    store = LRUCache(max_bytes=cache.estimate_size("x" * 100) * 2 + 10)
+    for key in "abc":
+        store.set(key, "x" * 100, ttl=60)
+    assert store.get("a") is None
+    assert len(store) == 2
+    assert store.stats()["bytes"] <= store.max_bytes
+
+
+def test_entry_goes_stale_then_expires(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    store = LRUCache()
+    store.set("k", "v", ttl=10, stale_ttl=5)
+    assert store.lookup("k") == ("v", True)
+    clock.now += 12
+    assert store.lookup("k") == ("v", False)
+    assert store.get("k") is None  # get() only returns fresh values
+    clock.now += 5
+    assert store.lookup("k") is None
+    assert len(store) == 0
+
+
+def test_fresh_for_reports_time_until_stale(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    store = LRUCache()
+    assert store.fresh_for("k") is None
+    store.set("k", "v", ttl=10, stale_ttl=5)
+    clock.now += 4
+    assert store.fresh_for("k") == 6
+
+
+def test_single_flight_shares_one_call():
+    calls = []
+    release = threading.Event()
+
+    @cache_response(ttl=60)
+    def slow_lookup(key):
+        calls.append(key)
+        release.wait(5)
+        return {"key": key}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(slow_lookup("same"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == ["same"]
+    assert len(results) == 8 and all(result is results[0] for result in results)
+
+
+def test_cache_key_ignores_argument_spelling_and_normalizes():
+    calls = []
+
+    @cache_response(ttl=60, normalize={"query": str.lower})
+    def search(query, page=1):
+        calls.append((query, page))
+        return [query, page]
+
+    assert search("Hello") == ["hello", 1]
+    assert search("HELLO", 1) == ["hello", 1]
+    assert search(query="hello", page=1) == ["hello", 1]
+    assert calls == [("hello", 1)]
+
+
+def test_stale_result_is_served_while_refreshed_in_background(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    values = iter(["old", "new"])
+
+    @cache_response(ttl=10, stale_ttl=60)
+    def lookup(key):
+        return next(values)
+
+    assert lookup("k") == "old"
+    clock.now += 20
+    assert lookup("k") == "old"
+    deadline = time.monotonic() + 5
+    while lookup.fresh_for("k") is None or lookup.fresh_for("k") < 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert lookup("k") == "new"
@@ -0,0 +1,48 @@
+import base64
+import json
+
+import pytest
+
+import app
+from response_helper import decode_cursor, encode_cursor, pagination_meta
+
+
+def cursor_for(state):
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode().rstrip("=")
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+def test_cursor_round_trip():
+    state = {"q": "tum hi ho", "p": 3, "l": 20, "s": False}
+    assert decode_cursor(encode_cursor(state)) == state
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    cursor_for(["a", "list"]),
+    cursor_for({"q": "a", "p": []}),
+    cursor_for({"q": "a", "p": None}),
+    cursor_for({"q": "a", "l": "many"}),
+    cursor_for({"q": "a", "s": "false"}),
+])
+def test_malformed_cursor_is_a_400(client, cursor):
+    response = client.get("/v2/songs/search", query_string={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json["message"] == "Invalid cursor"
+
+
+def test_next_cursor_continues_the_search(client, stub):
+    first = client.get("/v2/songs/search", query_string={"query": "arijit", "limit": 5, "scraping": "false"}).json
+    assert first["meta"]["has_next"]
+    second = client.get("/v2/songs/search", query_string={"cursor": first["meta"]["next_cursor"]}).json
+    assert second["meta"]["page"] == 2 and second["meta"]["limit"] == 5
+    assert {song["id"] for song in first["data"]}.isdisjoint(song["id"] for song in second["data"])
+
+
+def test_no_next_page_without_a_positive_limit():
+    assert not pagination_meta(1, 0, 10)["has_next"]
+    assert not pagination_meta(1, -3, 0, {"q": "a"})["next_cursor"]
@@ -0,0 +1,44 @@
+import pytest
+
+import cache
+import jiosaavn
+
+
+@pytest.fixture(autouse=True)
+def clean_supersets():
+    jiosaavn._search_supersets.clear()
+    jiosaavn._search_slices.clear()
+
+
+def test_superset_slices_match_direct_fetches(stub):
+    superset = jiosaavn.search_songs_page("kesariya", 1, 50, False)
+    slices = [jiosaavn.search_songs_page("kesariya", page, 10, False) for page in (1, 2, 5)]
+    assert stub.stats()["calls"] == {"search.getResults": 1}
+
+    jiosaavn._search_supersets.clear()
+    for page, sliced in zip((1, 2, 5), slices):
+        direct = jiosaavn.fetch_search_page("kesariya", page, 10, False)
+        assert [song["id"] for song in sliced["results"]] == [song["id"] for song in direct["results"]]
+        assert sliced["results"] == direct["results"]
+        assert sliced["total"] == superset["total"] == direct["total"]
+
+
+def test_expired_superset_is_not_refetched(stub):
+    jiosaavn.search_songs_page("kesariya", 1, 50, False)
+    cache.cache_store.clear()
+    stub.reset()
+    page = jiosaavn.search_songs_page("kesariya", 2, 5, False)
+    assert len(page["results"]) == 5
+    assert stub.stats()["calls"] == {"search.getResults": 1}
+
+
+def test_normalized_queries_share_a_cache_entry(stub):
+    first = jiosaavn.search_songs_page("Tum  Hi Ho", 1, 10, False)
+    assert jiosaavn.search_songs_page("tum hi ho", 1, 10, False) == first
+    assert stub.stats()["total"] == 1
+
+
+def test_fields_projection_keeps_only_requested_fields():
+    page = jiosaavn.search_songs_page("kesariya", 1, 5, False, fields="song,artists")
+    assert page["results"]
+    assert all(set(song) == {"id", "song", "artists"} for song in page["results"])
@@ -0,0 +1,52 @@
+import song_store
+from song_store import SongStore, song_codec, song_page_codec
+
+SONG = {
+    "id": "abc123", "song": "Tum Hi Ho", "artists": ["Arijit Singh"], "album": "Aashiqui 2",
+    "year": "2013", "language": "hindi", "duration_sec": 262, "play_count": 5, "image": "img",
+    "media_url": "media", "perma_url": "perma", "copyright": "(c) 2013", "lyrics_id": None,
+}
+
+
+def test_song_codec_round_trip_keeps_extra_fields():
+    song = dict(SONG, lyrics="some words")
+    packed = song_codec.pack(song)
+    assert packed == ("abc123", {"lyrics": "some words"})
+    assert song_codec.unpack(packed) == song
+    assert song_codec.unpack(packed) is song_codec.unpack(packed)
+
+
+def test_page_codec_round_trip():
+    page = {"results": [SONG, dict(SONG, id="def456", song="Kesariya")], "total": 2, "page": 1, "limit": 20}
+    packed = song_page_codec.pack(page)
+    assert packed[0] == ("abc123", "def456")
+    assert song_page_codec.unpack(packed) == page
+
+
+def test_fresher_copy_updates_every_cached_entry():
+    packed = song_page_codec.pack({"results": [SONG], "total": 1})
+    song_store.store.merge(dict(SONG, play_count=99))
+    assert song_page_codec.unpack(packed)["results"][0]["play_count"] == 99
+
+
+def test_partial_songs_are_cached_as_is():
+    partial = {"id": "abc123", "song": "Tum Hi Ho"}
+    assert song_codec.pack(partial) is partial
+    page = {"results": [partial], "total": 1}
+    assert song_page_codec.pack(page) is page
+    assert len(song_store.store) == 0
+
+
+def test_evicted_song_unpacks_as_a_miss():
+    packed = song_codec.pack(SONG)
+    song_store.store.clear()
+    song_codec.memo.clear()
+    assert song_codec.unpack(packed) is None
+
+
+def test_store_drops_least_recently_used_songs():
+    store = SongStore(max_songs=2)
+    for song_id in ("a", "b", "c"):
+        store.add(dict(SONG, id=song_id))
+    assert store.get("a") is None and store.get("c") is not None
+    assert store.stats()["evictions"] == 1
@@ -0,0 +1,151 @@
+import os
+import time
+import threading
+import requests
+import metrics
+from health import HealthRegistry
+from urllib.parse import urlsplit, parse_qs
+from requests.adapters import HTTPAdapter
+
+# Shared HTTP client for every call to jiosaavn.com.
+# One pooled keep-alive session per worker process, so repeated calls reuse
+# the same TCP+TLS connection instead of paying a new handshake each time.
+
+POOL_CONNECTIONS = int(os.environ.get("UPSTREAM_POOL_CONNECTIONS", 4))
+POOL_MAXSIZE = int(os.environ.get("UPSTREAM_POOL_MAXSIZE", 20))
+CONNECT_TIMEOUT = float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT = float(os.environ.get("UPSTREAM_READ_TIMEOUT", 10))
+
+# Circuit breaker and adaptive read timeout per endpoint; READ_TIMEOUT is the cap
+health = HealthRegistry(max_timeout=READ_TIMEOUT)
+
+
+class CircuitOpenError(requests.RequestException):
+    """The endpoint's circuit breaker is open, so the call wasn't made"""
+
+# Built once; requests only decodes gzip/deflate, so don't advertise br
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Referer': 'https://www.jiosaavn.com/',
+    'Origin': 'https://www.jiosaavn.com',
+    'Accept': 'application/json, text/plain, */*',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+# Extra headers for scraping the website (merged over DEFAULT_HEADERS per call)
+HTML_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'DNT': '1',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Cache-Control': 'max-age=0',
+}
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+_request_count = 0
+_stats_lock = threading.Lock()
+
+
+def _new_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def get_session():
+    """Return this worker's pooled session (recreated after a fork)"""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = _new_session()
+                _session_pid = pid
+    return _session
+
+
+def endpoint_name(url):
+    """Short name for metrics and health: the api.php __call, or "scrape" for web pages"""
+    parts = urlsplit(url)
+    if parts.path.endswith("/api.php"):
+        return parse_qs(parts.query).get("__call", ["api"])[0]
+    return "scrape"
+
+
+def is_failure(endpoint, status_code):
+    """Whether a response counts against the endpoint's health. For scraping,
+    403 and 429 mean the site is blocking us."""
+    if status_code >= 500 or status_code == 429:
+        return True
+    return endpoint == "scrape" and status_code == 403
+
+
+def get(url, headers=None, timeout=None, endpoint=None, **kwargs):
+    """GET through the pooled session. Body is gzip-decoded transparently.
+
+    Raises CircuitOpenError without calling out if the endpoint's breaker is
+    open. The default read timeout adapts to the endpoint's recent latency.
+    """
+    global _request_count
+    endpoint = endpoint or endpoint_name(url)
+    breaker = health.get(endpoint)
+    if not breaker.allow():
+        metrics.upstream_requests.inc(endpoint, "circuit_open")
+        raise CircuitOpenError(f"Circuit open for {endpoint}")
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, breaker.timeout())
+    with _stats_lock:
+        _request_count += 1
+    status = "error"
+    failed = True
+    start = time.perf_counter()
+    try:
+        response = get_session().get(url, headers=headers, timeout=timeout, **kwargs)
+        status = str(response.status_code)
+        failed = is_failure(endpoint, response.status_code)
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        breaker.record(elapsed, not failed)
+        metrics.upstream_seconds.observe(elapsed, endpoint)
+        metrics.upstream_requests.inc(endpoint, status)
+        metrics.add_timing("upstream." + endpoint, elapsed)
+
+
+def pool_stats():
+    """Connection pool statistics for this worker"""
+    session = get_session()
+    opened = 0
+    pool_requests = 0
+    pools = 0
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        manager = adapter.poolmanager
+        for key in list(manager.pools.keys()):
+            pool = manager.pools.get(key)
+            if pool is None:
+                continue
+            pools += 1
+            opened += pool.num_connections
+            pool_requests += pool.num_requests
+    return {
+        "pid": _session_pid,
+        "requests": _request_count,
+        "pools": pools,
+        "connections_opened": opened,
+        "connections_reused": max(0, pool_requests - opened),
+        "pool_connections": POOL_CONNECTIONS,
+        "pool_maxsize": POOL_MAXSIZE,
+    }
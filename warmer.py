@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import atexit
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Cache warming for the hottest cached calls (functions decorated with
+# cache_response(warm=True)). Calls are counted with a decaying score; every
+# WARM_INTERVAL seconds the hottest keys whose cached result is about to go
+# stale are recomputed in the background, so popular queries never fall out
+# of the cache. The hot set is written to disk at exit and replayed when the
+# next process starts, so a fresh worker serves cache hits from its first
+# request instead of paying upstream latency for every popular query again.
+#
+# Only one process per host warms: gunicorn workers compete for a lock file
+# next to the snapshot, and the holder replays the snapshot, runs the
+# warming rounds and writes the snapshot at exit. The others keep counting
+# calls and take over if the leader goes away. With the shared L2 cache,
+# what the leader warms is served to every worker.
+
+WARM_ENABLED = os.environ.get("CACHE_WARM_ENABLED", "true").lower() == "true"
+WARM_INTERVAL = float(os.environ.get("CACHE_WARM_INTERVAL", 30))
+# Refresh a key when its cached result goes stale within this many seconds
+WARM_AHEAD = float(os.environ.get("CACHE_WARM_AHEAD", 90))
+WARM_MAX_KEYS = int(os.environ.get("CACHE_WARM_MAX_KEYS", 200))
+WARM_MAX_REFRESHES = int(os.environ.get("CACHE_WARM_MAX_REFRESHES", 50))
+WARM_MIN_SCORE = float(os.environ.get("CACHE_WARM_MIN_SCORE", 2))
+WARM_DECAY = float(os.environ.get("CACHE_WARM_DECAY", 0.9))
+WARM_WORKERS = int(os.environ.get("CACHE_WARM_WORKERS", 4))
+WARM_TRACK_MAX = WARM_MAX_KEYS * 20
+WARM_SNAPSHOT_PATH = os.environ.get("CACHE_WARM_PATH", os.path.join(tempfile.gettempdir(), "jiosaavn-hot-keys.json"))
+
+
+class HotKeys:
+    """Call counts per (function name, arguments), decayed every round so
+    the hottest keys follow what's popular now"""
+
+    def __init__(self, max_tracked=WARM_TRACK_MAX):
+        self.max_tracked = max_tracked
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._scores)
+
+    def touch(self, name, values, weight=1.0):
+        key = (name, values)
+        with self._lock:
+            self._scores[key] = self._scores.get(key, 0.0) + weight
+            if len(self._scores) > self.max_tracked:
+                self._prune(self.max_tracked // 2)
+
+    def hottest(self, limit=WARM_MAX_KEYS, min_score=0.0):
+        """[(name, values, score)], hottest first"""
+        with self._lock:
+            ranked = sorted(self._scores.items(), key=lambda item: item[1], reverse=True)
+        return [(name, values, score) for (name, values), score in ranked[:limit] if score >= min_score]
+
+    def decay(self, factor=WARM_DECAY):
+        with self._lock:
+            self._scores = {key: score * factor for key, score in self._scores.items() if score * factor >= 0.1}
+
+    def discard(self, name, values):
+        with self._lock:
+            self._scores.pop((name, values), None)
+
+    def clear(self):
+        with self._lock:
+            self._scores.clear()
+
+    def snapshot(self, path=WARM_SNAPSHOT_PATH, limit=WARM_MAX_KEYS):
+        """Write the hottest keys to disk (atomically); returns how many"""
+        entries = [{"function": name, "args": list(values), "score": round(score, 3)}
+                   for name, values, score in self.hottest(limit)]
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        return len(entries)
+
+    def restore(self, path=WARM_SNAPSHOT_PATH):
+        """Load keys from a snapshot; returns [(name, values)], hottest first"""
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        restored = []
+        for entry in entries:
+            values = tuple(_from_json(value) for value in entry["args"])
+            # Decayed once, so scores don't compound over quick restarts
+            self.touch(entry["function"], values, float(entry.get("score", 1.0)) * WARM_DECAY)
+            restored.append((entry["function"], values))
+        return restored
+
+    def _prune(self, keep):
+        ranked = sorted(self._scores.items(), key=lambda item: item[1], reverse=True)
+        self._scores = dict(ranked[:keep])
+
+
+def _from_json(value):
+    # Tuple arguments (e.g. a normalized field list) come back from JSON as lists
+    return tuple(_from_json(item) for item in value) if isinstance(value, list) else value
+
+
+hot_keys = HotKeys()
+_functions = {}  # name -> cache_response wrapper
+_stats = {"rounds": 0, "refreshes": 0, "restored": 0, "failures": 0}
+_stats_lock = threading.Lock()
+_warm_executor = ThreadPoolExecutor(max_workers=WARM_WORKERS, thread_name_prefix="cache-warm")
+_thread = None
+_thread_lock = threading.Lock()
+_leader_lock = None  # lock file held while this process is the warming leader
+
+
+def register(name, wrapper):
+    """Called by cache_response(warm=True) for each warmed function"""
+    _functions[name] = wrapper
+
+
+def touch(name, values):
+    if WARM_ENABLED:
+        hot_keys.touch(name, values)
+
+
+def warm_once():
+    """One warming round: recompute the hottest keys that are missing or
+    about to go stale; returns how many were refreshed"""
+    due = []
+    for name, values, _ in hot_keys.hottest(WARM_MAX_KEYS, WARM_MIN_SCORE):
+        wrapper = _functions.get(name)
+        if wrapper is None:
+            continue
+        remaining = wrapper.fresh_for(*values)
+        if remaining is None:
+            due.append((name, wrapper.fill, values))  # not cached here; the L2 cache may have it
+        elif remaining < WARM_AHEAD:
+            due.append((name, wrapper.refresh, values))
+        if len(due) >= WARM_MAX_REFRESHES:
+            break
+    list(_warm_executor.map(_call, due))
+    hot_keys.decay()
+    with _stats_lock:
+        _stats["rounds"] += 1
+        _stats["refreshes"] += len(due)
+    return len(due)
+
+
+def _call(job):
+    """Warm one key. A key that fails or has no result (e.g. an unknown
+    song id, which is never cached) stops being warmed until it's called
+    again often enough to be hot."""
+    name, fn, values = job
+    try:
+        result = fn(*values)
+    except Exception as e:
+        print(f"Cache warming failed for {values}: {e}")
+        result = None
+    if result is None:
+        hot_keys.discard(name, values)
+        with _stats_lock:
+            _stats["failures"] += 1
+
+
+def _run():
+    while True:
+        time.sleep(WARM_INTERVAL)
+        try:
+            warm_once()
+        except Exception as e:
+            print(f"Cache warming round failed: {e}")
+
+
+def start():
+    """Replay the last snapshot and start the warming thread (once per process)"""
+    global _thread
+    if not WARM_ENABLED:
+        return
+    with _thread_lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        _thread = threading.Thread(target=_start, name="cache-warmer", daemon=True)
+        _thread.start()
+
+
+def _become_leader():
+    """Take the warming lock without waiting; True if this process holds it"""
+    global _leader_lock
+    if _leader_lock is not None:
+        return True
+    if fcntl is None or not WARM_SNAPSHOT_PATH:
+        # No way to coordinate, so every process warms on its own
+        _leader_lock = True
+        return True
+    lock_file = open(WARM_SNAPSHOT_PATH + ".lock", "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _leader_lock = lock_file
+    return True
+
+
+def _start():
+    while not _become_leader():
+        time.sleep(WARM_INTERVAL)
+    restored = _restore()
+    if restored:
+        jobs = [(name, _functions[name].fill, values) for name, values in restored if name in _functions]
+        list(_warm_executor.map(_call, jobs))
+        with _stats_lock:
+            _stats["restored"] += len(jobs)
+        print(f"Warmed {len(jobs)} cached calls from {WARM_SNAPSHOT_PATH}")
+    _run()
+
+
+def stats():
+    with _stats_lock:
+        warm_stats = dict(_stats)
+    warm_stats["tracked"] = len(hot_keys)
+    warm_stats["hot"] = len(hot_keys.hottest(WARM_MAX_KEYS, WARM_MIN_SCORE))
+    warm_stats["enabled"] = WARM_ENABLED
+    warm_stats["leader"] = _leader_lock is not None
+    return warm_stats
+
+
+def _restore():
+    if WARM_SNAPSHOT_PATH and os.path.exists(WARM_SNAPSHOT_PATH):
+        try:
+            return hot_keys.restore()
+        except Exception as e:
+            print(f"Could not restore hot keys from {WARM_SNAPSHOT_PATH}: {e}")
+    return []
+
+def _snapshot():
+    if WARM_ENABLED and WARM_SNAPSHOT_PATH and _leader_lock is not None and len(hot_keys):
+        try:
+            hot_keys.snapshot()
+        except Exception as e:
+            print(f"Could not snapshot hot keys to {WARM_SNAPSHOT_PATH}: {e}")
+
+atexit.register(_snapshot)